@@ -15,6 +15,10 @@ import os
 import uuid
 import json
 import time
+import queue
+import itertools
+import weakref
+from concurrent.futures import TimeoutError as RequestTimeout
 from pathlib import Path
 from typing import List
 import streamlit as st
@@ -25,37 +29,117 @@ from project.agents.coordinatorAgent import CoordinatorAgent
 from project.agents.ingestionAgent import IngestionAgent
 from project.agents.retrievalAgent import RetrievalAgent
 from project.agents.llmResponseAgent import LLMResponseAgent
+from project.llm.backends import StubBackend
+from project.llm.llmPool import sharedPool
+from project.vectorStore.resourceRegistry import getShardedStore, warmUp
 from dotenv import load_dotenv
 load_dotenv()
 
 google_api_key = os.getenv("GOOGLE_API_KEY")
+REQUEST_TIMEOUT = 120  # seconds to wait for an answer or for a file to be indexed
 # ------------------------------------------------------------
-# 1. Initialize singletons once per Streamlit session
+# 1. Initialize the bus and agents once per process, and a UI endpoint per session
 # ------------------------------------------------------------
-if "bus" not in st.session_state:
-    bus = MessageBus()
-    st.session_state.bus = bus
+@st.cache_resource
+def _agents() -> dict:
+    """The bus and agents every session shares (a session only adds its UI subscriber)."""
+    # async bus: every agent drains its own bounded inbox on worker threads, so
+    # uploads and questions pipeline through the agents instead of running
+    # recursively on the script thread; TRACING=0 turns off the latency spans
+    bus = MessageBus(async_mode=True, tracing=os.getenv("TRACING", "1") != "0")
+    bus.configure("CoordinatorAgent", workers=1, max_queue=64)
+    bus.configure("IngestionAgent",   workers=2, max_queue=32)
+    bus.configure("RetrievalAgent",   workers=2, max_queue=64)
+    bus.configure("LLMResponseAgent", workers=4, max_queue=32)
+
+    # the vector store and embedding model behind RetrievalAgent are
+    # process-wide too, see project/vectorStore/resourceRegistry.py
+    agents = {"bus": bus, "coordinator": CoordinatorAgent(bus)}
+    # SHARDS=n spreads the index over n worker processes
+    shards = int(os.getenv("SHARDS", "0"))
+    store = getShardedStore(shards=shards) if shards > 1 else None
+    agents["retrieval"] = RetrievalAgent(bus, store=store)
+    # the fingerprints of indexed files live next to the index they describe
+    sources_path = agents["retrieval"].store.sourcesPath
+    # INGESTION_PROCESSES=n parses uploads in n separate processes, each with its own bus
+    ingestion_processes = int(os.getenv("INGESTION_PROCESSES", "0"))
+    if ingestion_processes > 0:
+        agents["ingestion"] = bus.spawn("IngestionAgent", IngestionAgent,
+                                        processes=ingestion_processes, sources_path=sources_path)
+    else:
+        agents["ingestion"] = IngestionAgent(bus, sources_path=sources_path)
+    # FAKE_LLM=1 answers from a local stub backend, for trying the UI offline
+    llm = sharedPool("stub", StubBackend) if os.getenv("FAKE_LLM") else None
+    agents["llm_agent"] = LLMResponseAgent(bus, google_api_key=google_api_key, stream=True, llm=llm)
+    # the index and embedding model load on first use; start loading them now,
+    # off the script thread, so the page renders first (WARMUP=0 to skip)
+    agents["warm_up"] = warmUp(agents["retrieval"].store) if os.getenv("WARMUP", "1") != "0" else None
+    return agents
+
+
+class _SessionEnd:
+    """Lives only in one session's state; when Streamlit drops that state,
+    its finalizer detaches the session from the shared bus."""
+
+
+def _detach_session(bus: MessageBus, ui_name: str, on_message, log):
+    bus.unsubscribe(ui_name, on_message)
+    bus.unmonitor(log)
+
+
+if "ui_name" not in st.session_state:
+    agents = _agents()
+    bus = agents["bus"]
+    st.session_state.update(bus=bus, coordinator=agents["coordinator"], retrieval=agents["retrieval"],
+                            ingestion=agents["ingestion"], llm_agent=agents["llm_agent"],
+                            warm_up=agents["warm_up"])
+    # replies, progress and answer chunks for this session are addressed to its own name
+    ui_name = f"UI-{uuid.uuid4().hex[:8]}"
+    st.session_state.ui_name = ui_name
     st.session_state.logs = []
     st.session_state.show_logs_json = False
     st.session_state.upload_status = None
     st.session_state.processing_files = False
 
-    # log wrapper
-    def _logging_send(msg: dict):
-        st.session_state.logs.append(msg)
-        MessageBus.send(bus, msg)  # call original unbound send
+    # the Logs tab shows the messages of this session's traces (agents send from
+    # worker threads, so keep direct references instead of going through st.session_state)
+    logs = st.session_state.logs
+    traces = st.session_state.traces = set()
 
-    bus.send = _logging_send  # type: ignore
+    def _log(msg: dict):
+        if msg.get("trace_id") in traces:
+            logs.append(msg)
 
-    # create agents
-    st.session_state.coordinator = CoordinatorAgent(bus)
-    st.session_state.ingestion   = IngestionAgent(bus)
-    st.session_state.retrieval   = RetrievalAgent(bus)
-    st.session_state.llm_agent   = LLMResponseAgent(bus, google_api_key=google_api_key)
+    bus.monitor(_log)
+
+    # progress updates and answer chunks addressed to the UI are picked up by the script thread
+    progress_updates = queue.Queue()
+    answer_chunks = queue.Queue()
+    st.session_state.progress_updates = progress_updates
+    st.session_state.answer_chunks = answer_chunks
+
+    def _on_ui_message(msg: dict):
+        if msg["type"] == "INGESTION_PROGRESS":
+            progress_updates.put(msg["payload"])
+        elif msg["type"] == "LLM_RESPONSE_CHUNK":
+            answer_chunks.put((msg["trace_id"], msg["payload"]["text"]))
+
+    bus.configure(ui_name, workers=1, max_queue=256)
+    bus.subscribe(ui_name, _on_ui_message)
+    st.session_state.session_end = _SessionEnd()
+    weakref.finalize(st.session_state.session_end, _detach_session, bus, ui_name, _on_ui_message, _log)
 
     st.session_state.chat_history = []
 
 bus = st.session_state.bus
+ui_name = st.session_state.ui_name
+
+
+def new_trace() -> str:
+    """A trace id whose messages show up in this session's Logs tab."""
+    trace_id = str(uuid.uuid4())
+    st.session_state.traces.add(trace_id)
+    return trace_id
 
 # ------------------------------------------------------------
 # 2. Sidebar (Upload & Logs)
@@ -99,22 +183,32 @@ with st.sidebar:
                 progress_bar = st.progress(0)
                 status_placeholder = st.empty()
                 
-                for i, file in enumerate(uploaded_files):
-                    status_placeholder.text(f"Processing: {file.name}")
-                    progress_bar.progress((i + 1) / len(uploaded_files))
-                    
+                doc_paths = []
+                for file in uploaded_files:
                     file_path = temp_dir / file.name
                     with open(file_path, "wb") as f:
                         f.write(file.getbuffer())
-                    
-                    # Send to IngestionAgent
-                    bus.send({
-                        "sender":   "UI",
-                        "receiver": "IngestionAgent",
-                        "type":     "QUERY",
-                        "trace_id": str(uuid.uuid4()),
-                        "payload":  {"doc_path": str(file_path)},
-                    })
+                    doc_paths.append(str(file_path))
+                
+                # One batch for IngestionAgent (parsed in parallel); RetrievalAgent
+                # acks once every file is indexed
+                future = bus.request({
+                    "sender":   ui_name,
+                    "receiver": "IngestionAgent",
+                    "type":     "QUERY",
+                    "trace_id": new_trace(),
+                    "payload":  {"doc_paths": doc_paths, "notify": ui_name},
+                }, timeout=REQUEST_TIMEOUT, reply_type="INGESTION_ACK")
+                
+                while not future.done():
+                    try:
+                        update = st.session_state.progress_updates.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    status_placeholder.text(f"Parsed: {Path(update['source']).name}")
+                    progress_bar.progress(update["done"] / update["total"])
+                status_placeholder.text("Indexed all files")
+                future.result()
                 
                 # Success message
                 st.success(f"✅ Successfully uploaded {len(uploaded_files)} file(s)!")
@@ -126,6 +220,25 @@ with st.sidebar:
                 st.error(f"❌ Error uploading files: {str(e)}")
                 st.session_state.processing_files = False
 
+        # Restrict questions to some of the indexed documents. The list comes from
+        # the metadata table, but a sharded store's shards are busy while they
+        # warm up, so wait for the next render rather than block this one
+        warming = st.session_state.warm_up
+        if warming is not None and warming.is_alive():
+            indexed_sources = []
+            st.caption("⏳ Loading the index…")
+        else:
+            indexed_sources = st.session_state.retrieval.store.sources()
+        if indexed_sources:
+            st.divider()
+            st.multiselect(
+                "🔎 Search only in",
+                indexed_sources,
+                key="search_sources",
+                format_func=os.path.basename,
+                help="Leave empty to search every document"
+            )
+
     with tab_logs:
         st.header("📊 Message Logs")
         
@@ -141,6 +254,32 @@ with st.sidebar:
                 recent_msg = st.session_state.logs[-1]
                 st.metric("Latest", recent_msg.get('type', 'Unknown'))
         
+        # LLM call statistics (shared by every session using the same backend)
+        with st.expander("🤖 LLM calls"):
+            st.json(st.session_state.llm_agent.llm.metrics.snapshot())
+
+        # per-stage latency percentiles and the breakdown of one request
+        # (the bus is shared, so these cover every session)
+        if bus.tracer.enabled:
+            with st.expander("⏱️ Latency"):
+                tracing = bus.tracer.snapshot()
+                st.dataframe(
+                    [{"stage": stage, "count": s["count"],
+                      **{f"p{p} (ms)": round(s[f"p{p}"] * 1000, 1) for p in (50, 95, 99)}}
+                     for stage, s in sorted(tracing["stages"].items())],
+                    use_container_width=True, hide_index=True
+                )
+                traces = [t for t in bus.tracer.recent() if t in st.session_state.traces]
+                if traces:
+                    trace_id = st.selectbox("Trace", traces, help="Newest first")
+                    st.dataframe(
+                        [{"start (ms)": round(s["offset"] * 1000, 1), "agent": s["agent"],
+                          "stage": s["name"], "duration (ms)": round(s["seconds"] * 1000, 1)}
+                         for s in bus.tracer.breakdown(trace_id)],
+                        use_container_width=True, hide_index=True
+                    )
+                st.caption(f"Messages handled: {tracing['counters']}")
+
         # Control buttons
         col1, col2 = st.columns(2)
         
@@ -151,7 +290,7 @@ with st.sidebar:
         
         with col2:
             if st.button("🗑️ Clear All", help="Clear all logs"):
-                st.session_state.logs = []
+                st.session_state.logs.clear()
                 st.session_state.show_logs_json = False
                 st.rerun()
         
@@ -194,7 +333,11 @@ with st.sidebar:
                 # Choose emoji based on message type
                 emoji_map = {
                     "USER_QUERY": "🙋‍♂️",
+                    "USER_RESPONSE": "📬",
+                    "INGESTION_PROGRESS": "⏳",
+                    "INGESTION_ACK": "📥",
                     "LLM_RESPONSE": "🤖",
+                    "LLM_RESPONSE_CHUNK": "✍️",
                     "QUERY": "🔍",
                     "RESPONSE": "💬",
                     "ERROR": "❌",
@@ -221,12 +364,9 @@ for i, (user_msg, assistant_msg) in enumerate(st.session_state.chat_history):
     with st.chat_message("user"):
         st.write(user_msg)
     
-    # Assistant message
-    with st.chat_message("assistant"):
-        if assistant_msg == "(thinking…)":
-            with st.spinner("🤔 Processing your question..."):
-                st.write("Thinking...")
-        else:
+    # Assistant message (a pending answer is streamed in below)
+    if assistant_msg != "(thinking…)":
+        with st.chat_message("assistant"):
             st.write(assistant_msg)
 
 # Chat input
@@ -242,39 +382,49 @@ if user_input:
 if st.session_state.chat_history and st.session_state.chat_history[-1][1] == "(thinking…)":
     query = st.session_state.chat_history[-1][0]
     
-    # Send query only once
-    if "waiting_for_response" not in st.session_state:
-        trace_id = str(uuid.uuid4())
-        st.session_state.waiting_trace_id = trace_id
-        st.session_state.waiting_for_response = True
-        st.session_state.initial_log_count = len(st.session_state.logs)
-        
-        bus.send({
-            "sender":   "UI",
-            "receiver": "CoordinatorAgent",
-            "type":     "USER_QUERY",
-            "trace_id": trace_id,
-            "payload":  {"query": query},
-        })
-
-    # Check for new LLM_RESPONSE
-    if "initial_log_count" in st.session_state:
-        current_log_count = len(st.session_state.logs)
-        if current_log_count > st.session_state.initial_log_count:
-            # Look for LLM_RESPONSE in new logs
-            for msg in st.session_state.logs[st.session_state.initial_log_count:]:
-                if msg.get("type") == "LLM_RESPONSE" and "payload" in msg and "answer" in msg["payload"]:
-                    # Found response!
-                    answer = msg["payload"]["answer"]
-                    st.session_state.chat_history[-1] = (query, answer)
-                    del st.session_state.waiting_for_response
-                    del st.session_state.waiting_trace_id
-                    del st.session_state.initial_log_count
-                    st.rerun()
+    # The coordinator forwards LLM_RESPONSE_CHUNK messages as the model writes
+    # and replies to this session with the full answer under this trace_id at the end
+    trace_id = new_trace()
+    search_sources = st.session_state.get("search_sources")
+    future = bus.request({
+        "sender":   ui_name,
+        "receiver": "CoordinatorAgent",
+        "type":     "USER_QUERY",
+        "trace_id": trace_id,
+        "payload":  {"query": query, "filters": {"source": search_sources} if search_sources else None},
+    }, timeout=REQUEST_TIMEOUT, reply_type="USER_RESPONSE")
+
+    def stream_answer():
+        received = ""
+        while True:
+            try:
+                chunk_trace, text = st.session_state.answer_chunks.get(timeout=0.05)
+            except queue.Empty:
+                if future.done():
                     break
-    
-    # Continue waiting
-    time.sleep(0.2)
+                continue
+            if chunk_trace == trace_id:  # skip leftovers of an earlier question
+                received += text
+                yield text
+        try:
+            answer = future.result()["payload"]["answer"]
+        except RequestTimeout:
+            answer = "⚠️ No answer within the time limit, please try again."
+        except Exception as e:
+            answer = f"❌ Error answering the question: {str(e)}"
+        # cached answers arrive whole; streamed ones end with the chunks already shown
+        if answer.startswith(received):
+            yield answer[len(received):]
+        else:
+            yield ("\n\n" if received else "") + answer
+
+    with st.chat_message("assistant"):
+        with st.spinner("🤔 Processing your question..."):
+            first = stream_answer()
+            head = next(first, "")
+        answer = st.write_stream(itertools.chain([head], first))
+
+    st.session_state.chat_history[-1] = (query, answer)
     st.rerun()
 
 # ------------------------------------------------------------
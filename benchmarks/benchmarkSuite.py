@@ -0,0 +1,256 @@
+# benchmarks/benchmark_suite.py
+"""Measures ingestion, retrieval and end-to-end latency on a synthetic corpus and writes JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.benchmarkSuite --megabytes 1 --out results.json
+    python -m benchmarks.benchmarkSuite --megabytes 1 --out new.json --compare results.json
+
+Stages: parse throughput per format (``DocumentParser``), embedding throughput
+(``Embedder``), build time, search latency and recall@k against exact search
+for every FAISS index type, ingestion and search through ``FaissStore``, and
+the round trip of a question through the agents on the bus with the stub LLM.
+"""
+import argparse, json, os, platform, random, shutil, subprocess, tempfile, time
+from typing import Callable, Dict, List, Sequence, Tuple
+import numpy as np
+import faiss
+from benchmarks.corpusGenerator import FORMATS, generateCorpus
+from project.documentParsers.parsers import DocumentParser
+from project.vectorStore.embedder import Embedder, EMBED_BACKENDS
+from project.vectorStore.faissStore import FaissStore
+from project.vectorStore import indexFactory
+
+K = 10
+HIGHER_IS_BETTER = ("_per_s", "recall")  # metric name endings; every other metric is a time
+
+
+def percentiles(seconds: Sequence[float]) -> Dict[str, float]:
+    """p50 / p99 of `seconds`, in milliseconds."""
+    ordered = sorted(seconds)
+    return {f"p{p}_ms": round(ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000, 3)
+            for p in (50, 99)}
+
+
+def timed(fn: Callable[[], object], repeat: int):
+    """Best time of `repeat` runs of `fn`, and its result."""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def latencies(fn: Callable[[int], object], n: int) -> List[float]:
+    out = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        out.append(time.perf_counter() - start)
+    return out
+
+
+def queriesFrom(chunks: Sequence[str], n: int, seed: int) -> List[str]:
+    """Questions made of the first words of random chunks."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(chunks).split()[:8]) for _ in range(n)]
+
+
+# ---------- stages ----------
+def benchParse(paths: Sequence[str], parser: DocumentParser, repeat: int) -> Tuple[dict, Dict[str, List[str]]]:
+    results, chunksByPath = {}, {}
+    for path in paths:
+        fmt = os.path.splitext(path)[1][1:]
+        seconds, chunks = timed(lambda: parser.parse(path), repeat)
+        chunksByPath[path] = chunks
+        entry = results.setdefault(fmt, {"files": 0, "megabytes": 0.0, "chunks": 0, "seconds": 0.0})
+        entry["files"] += 1
+        entry["megabytes"] += sum(len(c) for c in chunks) / 1e6
+        entry["chunks"] += len(chunks)
+        entry["seconds"] += seconds
+    for entry in results.values():
+        entry["text_mb_per_s"] = round(entry["megabytes"] / entry["seconds"], 3)
+        entry["chunks_per_s"] = round(entry["chunks"] / entry["seconds"], 1)
+        entry["megabytes"] = round(entry["megabytes"], 3)
+        entry["seconds"] = round(entry["seconds"], 4)
+    return results, chunksByPath
+
+
+def benchEmbed(embedder: Embedder, chunks: Sequence[str], repeat: int) -> Tuple[dict, np.ndarray]:
+    embedder.embedPassages(chunks[:32])  # warm-up
+    seconds, vecs = timed(lambda: embedder.embedPassages(chunks), repeat)
+    return {"chunks": len(chunks), "seconds": round(seconds, 4),
+            "chunks_per_s": round(len(chunks) / seconds, 1)}, vecs
+
+
+def benchIndexes(vecs: np.ndarray, queryVecs: np.ndarray, indexTypes: Sequence[str],
+                 storage: str, k: int) -> dict:
+    """Build every index type over `vecs` and compare its top-k with exact inner-product search."""
+    exact = faiss.IndexFlatIP(vecs.shape[1])
+    exact.add(vecs)
+    _, truth = exact.search(queryVecs, k)
+    ids = np.arange(len(vecs), dtype="int64")
+    results = {}
+    for indexType in indexTypes:
+        needed = indexFactory.minTrain(indexType, storage)
+        if len(vecs) < needed:
+            results[indexType] = {"skipped": f"needs {needed} vectors, the corpus has {len(vecs)}"}
+            continue
+        start = time.perf_counter()
+        index = indexFactory.buildIndex(indexType, vecs.shape[1], len(vecs), storage=storage)
+        indexFactory.trainIndex(index, vecs)
+        index.add_with_ids(vecs, ids)
+        build = time.perf_counter() - start
+        indexFactory.tuneIndex(index, nprobe=16, efSearch=64)
+        _, found = index.search(queryVecs, k)
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        times = latencies(lambda i: index.search(queryVecs[i:i + 1], k), len(queryVecs))
+        results[indexType] = {"build_seconds": round(build, 4), f"recall_at_{k}": round(float(recall), 4),
+                              **percentiles(times)}
+    return results
+
+
+def benchStore(rootDir: str, chunksByPath: Dict[str, List[str]], queries: Sequence[str],
+               embedder: Embedder, k: int) -> Tuple[dict, FaissStore]:
+    store = FaissStore(indexPath=os.path.join(rootDir, "index.faiss"), metaPath=os.path.join(rootDir, "meta.json"),
+                       cachePath=None, embedder=embedder)
+    chunks = sum(len(c) for c in chunksByPath.values())
+    start = time.perf_counter()
+    store.upsert_many(list(chunksByPath.items()))
+    ingest = time.perf_counter() - start
+    times = latencies(lambda i: store.search(queries[i], k=k), len(queries))
+    return {"chunks": chunks, "ingest_seconds": round(ingest, 4),
+            "ingest_chunks_per_s": round(chunks / ingest, 1), "search": percentiles(times)}, store
+
+
+def benchRoundTrip(store: FaissStore, queries: Sequence[str]) -> dict:
+    """USER_QUERY -> USER_RESPONSE through every agent on an async bus, with an instant stub LLM."""
+    from project.mcp.messageBus import MessageBus
+    from project.agents.answerCache import AnswerCache
+    from project.agents.coordinatorAgent import CoordinatorAgent
+    from project.agents.retrievalAgent import RetrievalAgent
+    from project.agents.llmResponseAgent import LLMResponseAgent
+    from project.llm.backends import StubBackend
+    from project.llm.llmPool import LLMPool
+
+    bus = MessageBus(async_mode=True, tracing=True)
+    CoordinatorAgent(bus)
+    RetrievalAgent(bus, store=store)
+    llm = LLMPool(StubBackend(latency=0.0, tokenDelay=0.0), ratePerSec=1e9, burst=1_000_000)
+    LLMResponseAgent(bus, google_api_key="", llm=llm, cache=AnswerCache(maxEntries=0))
+
+    def ask(i: int):
+        bus.request({"sender": "Benchmark", "receiver": "CoordinatorAgent", "type": "USER_QUERY",
+                     "trace_id": f"bench-{i}", "payload": {"query": queries[i]}},
+                    timeout=60, reply_type="USER_RESPONSE").result()
+
+    ask(0)  # warm-up
+    bus.tracer.clear()
+    times = latencies(ask, len(queries))
+    stages = {stage: {"count": s["count"], **{f"{p}_ms": round(s[p] * 1000, 3) for p in ("p50", "p99")}}
+              for stage, s in bus.tracer.snapshot()["stages"].items()}
+    bus.shutdown()
+    return {"queries": len(queries), **percentiles(times), "stages": stages}
+
+
+# ---------- results ----------
+def environment(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "faiss": faiss.__version__, "numpy": np.__version__,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args)}
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+    return out
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Metrics that got worse than `baseline` by more than `threshold` (a fraction)."""
+    now, before = flatten(current), flatten(baseline)
+    regressions = []
+    print(f"{'metric':<60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        if not old or not any(tag in name for tag in HIGHER_IS_BETTER + ("seconds", "_ms")):
+            continue
+        change = (new - old) / old
+        worse = -change if any(tag in name for tag in HIGHER_IS_BETTER) else change
+        flag = "  !" if worse > threshold else ""
+        print(f"{name:<60} {old:>12.4g} {new:>12.4g} {change:>+7.1%}{flag}")
+        if worse > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--corpus", default=os.path.join("benchmarks", "corpus"), help="where documents are generated")
+    ap.add_argument("--megabytes", type=float, default=1.0, help="text per document")
+    ap.add_argument("--files", type=int, default=1, help="documents per format")
+    ap.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--model", default="intfloat/e5-small-v2")
+    ap.add_argument("--backend", default="torch", choices=EMBED_BACKENDS)
+    ap.add_argument("--threads", type=int, default=None)
+    ap.add_argument("--index-types", nargs="+", default=list(indexFactory.INDEX_TYPES),
+                    choices=indexFactory.INDEX_TYPES)
+    ap.add_argument("--storage", default="float32", choices=indexFactory.STORAGE_TYPES)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=K)
+    ap.add_argument("--repeat", type=int, default=3, help="runs of the throughput stages; the best is kept")
+    ap.add_argument("--out", default="benchmark-results.json")
+    ap.add_argument("--compare", help="earlier results to compare with; exits with 1 on regressions")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before a metric is flagged")
+    args = ap.parse_args()
+
+    paths = generateCorpus(args.corpus, args.megabytes, args.files, args.formats, args.seed)
+    results = {}
+    results["parse"], chunksByPath = benchParse(paths, DocumentParser(), args.repeat)
+    chunks = [c for cs in chunksByPath.values() for c in cs]
+    print(f"parsed {len(paths)} files into {len(chunks)} chunks")
+
+    embedder = Embedder(args.model, args.backend, args.threads)
+    results["embed"], vecs = benchEmbed(embedder, chunks, args.repeat)
+    queries = queriesFrom(chunks, args.queries, args.seed)
+    queryVecs = embedder.embedQueries(queries)
+    print(f"embedded at {results['embed']['chunks_per_s']} chunks/s")
+
+    results["index"] = benchIndexes(vecs, queryVecs, args.index_types, args.storage, args.k)
+    rootDir = tempfile.mkdtemp(prefix="slris-bench-")
+    try:
+        results["store"], store = benchStore(rootDir, chunksByPath, queries, embedder, args.k)
+        results["round_trip"] = benchRoundTrip(store, queries)
+        store.close()
+    finally:
+        shutil.rmtree(rootDir, ignore_errors=True)
+
+    report = {"environment": environment(args), "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/chunker_benchmark.py
+"""Compares the token-aware chunker with the old ``re.sub`` + ``textwrap.wrap`` path.
+
+Run from the repository root:
+
+    python -m benchmarks.chunkerBenchmark --sizes 1 2 4 8
+"""
+import argparse, random, re, textwrap, time
+from project.documentParsers.chunker import TokenChunker
+
+LEGACY_WIDTH = 500  # the old CHUNK_SIZE, in characters
+WORDS = ("the of and to in is for that with on retrieval agent vector index document "
+         "parser embedding latency throughput chunk sentence paragraph model query").split()
+
+
+def syntheticText(megabytes: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < megabytes * 1_000_000:
+        sentences = (" ".join(rng.choices(WORDS, k=rng.randint(5, 30))).capitalize() + "."
+                     for _ in range(rng.randint(1, 8)))
+        paragraph = " ".join(sentences)
+        parts.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(parts)
+
+
+def legacyChunk(text: str):
+    cleaned = re.sub(r"\s+", " ", text).strip()
+    return textwrap.wrap(cleaned, LEGACY_WIDTH)
+
+
+def timed(fn, text: str, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=float, nargs="+", default=[1, 2, 4, 8], help="text sizes in MB")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    chunker = TokenChunker()
+    print(f"{'MB':>5} {'textwrap s':>11} {'chunks':>7} {'chunker s':>10} {'chunks':>7} {'MB/s':>7} {'speedup':>8}")
+    for mb in args.sizes:
+        text = syntheticText(mb)
+        legacyTime, legacy = timed(legacyChunk, text, args.repeat)
+        newTime, chunks = timed(chunker.chunk, text, args.repeat)
+        print(f"{mb:>5g} {legacyTime:>11.3f} {len(legacy):>7} {newTime:>10.3f} {len(chunks):>7} "
+              f"{len(text) / 1e6 / newTime:>7.1f} {legacyTime / newTime:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
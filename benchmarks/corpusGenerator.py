@@ -0,0 +1,141 @@
+# benchmarks/corpus_generator.py
+"""Writes a synthetic document corpus (PDF, DOCX, PPTX, CSV, TXT) for the benchmarks.
+
+Run from the repository root:
+
+    python -m benchmarks.corpusGenerator --out benchmarks/corpus --megabytes 1 --files 2
+"""
+import argparse, os, random
+from typing import List, Sequence
+import pandas as pd
+import docx, pptx
+from benchmarks.chunkerBenchmark import WORDS, syntheticText
+
+FORMATS = ("pdf", "docx", "pptx", "csv", "txt")
+PAGE_CHARS = 3000   # characters of text per PDF page / PPTX slide
+PDF_LINE = 90       # characters per PDF text line
+
+
+def generateCorpus(outDir: str, megabytes: float = 1.0, files: int = 1,
+                   formats: Sequence[str] = FORMATS, seed: int = 0) -> List[str]:
+    """Write `files` documents of each format with about `megabytes` of text each.
+
+    The same seed gives the same text, so runs on different revisions parse
+    the same corpus. Existing files are reused. Returns the paths written.
+    """
+    os.makedirs(outDir, exist_ok=True)
+    paths = []
+    for n in range(files):
+        for fmt in formats:
+            path = os.path.join(outDir, f"doc-{seed}-{n}-{megabytes:g}mb.{fmt}")
+            if not os.path.exists(path):
+                text = syntheticText(megabytes, seed=seed * 1000 + n)
+                WRITERS[fmt](path, text, random.Random(seed * 1000 + n))
+            paths.append(path)
+    return paths
+
+
+def pages(text: str) -> List[List[str]]:
+    """Paragraphs of `text` grouped into pages of about ``PAGE_CHARS`` characters."""
+    out, page, size = [], [], 0
+    for paragraph in text.split("\n\n"):
+        page.append(paragraph)
+        size += len(paragraph)
+        if size >= PAGE_CHARS:
+            out.append(page)
+            page, size = [], 0
+    if page:
+        out.append(page)
+    return out
+
+
+def writeTxt(path: str, text: str, rng: random.Random):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def writeDocx(path: str, text: str, rng: random.Random):
+    document = docx.Document()
+    for paragraph in text.split("\n\n"):
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def writePptx(path: str, text: str, rng: random.Random):
+    deck = pptx.Presentation()
+    layout = deck.slide_layouts[1]  # title and content
+    for n, page in enumerate(pages(text)):
+        slide = deck.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {n + 1}: {' '.join(rng.choices(WORDS, k=4))}"
+        slide.placeholders[1].text_frame.text = "\n".join(page)
+    deck.save(path)
+
+
+def writeCsv(path: str, text: str, rng: random.Random):
+    paragraphs = text.split("\n\n")
+    pd.DataFrame({
+        "id": range(len(paragraphs)),
+        "category": [rng.choice(WORDS) for _ in paragraphs],
+        "score": [round(rng.random() * 100, 2) for _ in paragraphs],
+        "text": paragraphs,
+    }).to_csv(path, index=False)
+
+
+def writePdf(path: str, text: str, rng: random.Random):
+    """A plain PDF with one Helvetica text stream per page, written without a PDF library."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pageIds = []
+    for page in pages(text):
+        lines = []
+        for paragraph in page:
+            words, line = paragraph.split(), ""
+            for word in words:
+                if line and len(line) + len(word) + 1 > PDF_LINE:
+                    lines.append(line)
+                    line = ""
+                line = f"{line} {word}" if line else word
+            lines.extend([line, ""])
+        body = "".join(f"({_pdfEscape(l)}) Tj T* " for l in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {body}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>".encode("ascii"))
+        pageIds.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in pageIds)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(pageIds)} >>".encode("ascii")
+
+    out, offsets = [b"%PDF-1.4\n"], []
+    size = len(out[0])
+    for n, obj in enumerate(objects, start=1):
+        offsets.append(size)
+        chunk = b"%d 0 obj\n%s\nendobj\n" % (n, obj)
+        out.append(chunk)
+        size += len(chunk)
+    out.append(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.extend(b"%010d 00000 n \n" % o for o in offsets)
+    out.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, size))
+    with open(path, "wb") as f:
+        f.write(b"".join(out))
+
+
+def _pdfEscape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+WRITERS = {"pdf": writePdf, "docx": writeDocx, "pptx": writePptx, "csv": writeCsv, "txt": writeTxt}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--out", default="benchmarks/corpus")
+    ap.add_argument("--megabytes", type=float, default=1.0, help="text per document")
+    ap.add_argument("--files", type=int, default=1, help="documents per format")
+    ap.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    for path in generateCorpus(args.out, args.megabytes, args.files, args.formats, args.seed):
+        print(f"{path}  {os.path.getsize(path) / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/embedding_benchmark.py
+"""Compares embedding throughput of the Embedder backends with the old fixed-batch encode path.
+
+Run from the repository root (the ONNX backends need ``pip install sentence-transformers[onnx]``):
+
+    python -m benchmarks.embeddingBenchmark --chunks 2000 --backends torch onnx onnx-int8 --threads 4
+"""
+import argparse, time
+import numpy as np
+from benchmarks.chunkerBenchmark import syntheticText
+from project.documentParsers.chunker import TokenChunker
+from project.vectorStore.embedder import Embedder, BATCH_TOKENS, EMBED_BACKENDS, loadModel
+
+LEGACY_BATCH = 64  # the old FaissStore.embedBatchSize
+
+
+def corpus(chunks: int):
+    """Chunks as the ingestion path produces them: mostly full, with short paragraph tails."""
+    texts = TokenChunker().chunk(syntheticText(0.002 * chunks))
+    return texts[:chunks]
+
+
+def timed(fn, texts, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(texts)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--model", default="intfloat/e5-small-v2")
+    ap.add_argument("--chunks", type=int, default=2000)
+    ap.add_argument("--backends", nargs="+", default=list(EMBED_BACKENDS), choices=EMBED_BACKENDS)
+    ap.add_argument("--threads", type=int, default=None)
+    ap.add_argument("--batch-tokens", type=int, default=BATCH_TOKENS)
+    ap.add_argument("--repeat", type=int, default=2)
+    args = ap.parse_args()
+
+    texts = corpus(args.chunks)
+    legacyModel = loadModel(args.model, "torch", args.threads)
+    legacy = lambda t: legacyModel.encode(t, batch_size=LEGACY_BATCH, normalize_embeddings=True)
+    legacy(texts[:LEGACY_BATCH])  # warm-up
+    baseTime, _ = timed(legacy, texts, args.repeat)
+    print(f"{len(texts)} chunks, mean {np.mean([len(t) for t in texts]):.0f} characters")
+    print(f"{'path':<22} {'s':>8} {'chunks/s':>9} {'speedup':>8} {'cos vs torch':>13}")
+    print(f"{'encode(batch=64)':<22} {baseTime:>8.2f} {len(texts) / baseTime:>9.1f} {'1.0x':>8} {'':>13}")
+
+    reference = None
+    for backend in args.backends:
+        embedder = Embedder(args.model, backend, args.threads, batchTokens=args.batch_tokens)
+        try:
+            embedder.embedPassages(texts[:32])  # warm-up; loads the model, so a missing backend shows here
+        except ImportError as exc:
+            print(f"{backend:<22} skipped ({exc})")
+            continue
+        seconds, vecs = timed(embedder.embedPassages, texts, args.repeat)
+        if reference is None and backend == "torch":
+            reference = vecs
+        agreement = "" if reference is None else f"{np.mean(np.sum(vecs * reference, axis=1)):.4f}"
+        print(f"{backend:<22} {seconds:>8.2f} {len(texts) / seconds:>9.1f} "
+              f"{baseTime / seconds:>7.1f}x {agreement:>13}")
+
+
+if __name__ == "__main__":
+    main()
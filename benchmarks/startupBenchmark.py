@@ -0,0 +1,87 @@
+# benchmarks/startup_benchmark.py
+"""Measures the cold start of the app's backend: imports, agent construction and the first question.
+
+Every measurement runs in a fresh interpreter. Run from the repository root:
+
+    python -m benchmarks.startupBenchmark --runs 5
+    python -m benchmarks.startupBenchmark --root /path/to/older/checkout   # the same, for another revision
+
+``--root`` only changes where the ``project`` package is imported from, so two
+checkouts can be compared with this script.
+"""
+import argparse, json, os, statistics, subprocess, sys, tempfile
+
+HEAVY = ("pandas", "docx", "pptx", "PyPDF2", "faiss", "torch", "sentence_transformers", "google.genai")
+
+# runs in the child; prints one JSON line
+PROBE = r"""
+import json, os, sys, time
+start = time.perf_counter()
+from project.mcp.messageBus import MessageBus
+from project.agents.coordinatorAgent import CoordinatorAgent
+from project.agents.ingestionAgent import IngestionAgent
+from project.agents.retrievalAgent import RetrievalAgent
+from project.agents.llmResponseAgent import LLMResponseAgent
+from project.llm.backends import StubBackend
+from project.llm.llmPool import LLMPool
+from project.vectorStore import resourceRegistry
+imported = time.perf_counter()
+loaded = {name: name in sys.modules for name in HEAVY}
+
+os.chdir(WORKDIR)  # IngestionAgent keeps sources.json in the working directory
+bus = MessageBus(async_mode=True)
+CoordinatorAgent(bus)
+IngestionAgent(bus)
+retrieval = RetrievalAgent(bus, store=resourceRegistry.getStore(os.path.join(WORKDIR, "index.faiss"),
+                                                                 cachePath=None))
+LLMResponseAgent(bus, google_api_key="", llm=LLMPool(StubBackend(latency=0.0, tokenDelay=0.0)))
+constructed = time.perf_counter()
+if WARMUP and hasattr(resourceRegistry, "warmUp"):  # older revisions load everything up front
+    resourceRegistry.warmUp(retrieval.store, background=False)
+warmed = time.perf_counter()
+bus.request({"sender": "UI", "receiver": "CoordinatorAgent", "type": "USER_QUERY", "trace_id": "t",
+             "payload": {"query": "What is in the documents?"}}, timeout=600, reply_type="USER_RESPONSE").result()
+answered = time.perf_counter()
+bus.shutdown()
+print(json.dumps({"import_s": imported - start, "construct_s": constructed - imported,
+                  "warm_up_s": warmed - constructed, "first_answer_s": answered - warmed,
+                  "loaded_at_import": loaded}))
+"""
+
+
+def probe(root: str, warmUp: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="slris-startup-") as workDir:
+        code = f"HEAVY = {HEAVY!r}\nWORKDIR = {workDir!r}\nWARMUP = {warmUp!r}\n" + PROBE
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+        # `python -c` puts the working directory first on sys.path, so run it from `root`
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--root", default=os.getcwd(), help="checkout whose project package is measured")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--out", help="also write the results to this JSON file")
+    args = ap.parse_args()
+
+    results = {}
+    for warm in (False, True):
+        runs = [probe(args.root, warm) for _ in range(args.runs)]
+        key = "with_warm_up" if warm else "cold"
+        results[key] = {metric: round(statistics.median(r[metric] for r in runs), 4)
+                        for metric in ("import_s", "construct_s", "warm_up_s", "first_answer_s")}
+        results[key]["loaded_at_import"] = [name for name, loaded in runs[0]["loaded_at_import"].items() if loaded]
+    print(f"{'':<14} {'import s':>9} {'agents s':>9} {'warm-up s':>10} {'1st answer s':>13}  loaded by the imports")
+    for key, r in results.items():
+        print(f"{key:<14} {r['import_s']:>9.3f} {r['construct_s']:>9.3f} {r['warm_up_s']:>10.3f} "
+              f"{r['first_answer_s']:>13.3f}  {', '.join(r['loaded_at_import']) or '-'}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# agents/answer_cache.py
+from typing import Dict, List, Optional, Sequence
+from collections import OrderedDict
+import time, hashlib, threading
+import numpy as np
+
+ANSWER_ENTRIES = 1024    # answers kept before the least recently used is evicted
+ANSWER_TTL = 3600.0      # seconds an answer stays valid
+MIN_SIMILARITY = 0.95    # cosine similarity at which two questions count as the same
+
+
+def contextFingerprint(context: Sequence[str]) -> str:
+    h = hashlib.sha1()
+    for chunk in context:
+        h.update(chunk.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class AnswerCache:
+    """In-memory LRU/TTL cache of LLM answers, matched by meaning rather than text.
+
+    An answer is reused when the new question's embedding has cosine similarity
+    of at least ``threshold`` with a cached question, the retrieved context is
+    byte-for-byte the same (``contextFingerprint``) and the store has not been
+    written to since (``storeVersion``). A new store version drops every
+    answer built on an older one.
+    """
+
+    def __init__(self, maxEntries: int = ANSWER_ENTRIES, ttl: float = ANSWER_TTL,
+                 threshold: float = MIN_SIMILARITY):
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[int, dict]" = OrderedDict()  # entry id -> entry, oldest first
+        self.byContext: Dict[str, List[int]] = {}                # fingerprint -> entry ids
+        self.version: Optional[int] = None
+        self.nextId = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- public ----------
+    def get(self, queryVector: Sequence[float], fingerprint: str, storeVersion: int) -> Optional[str]:
+        vec = self._normalize(queryVector)
+        now = time.monotonic()
+        with self.lock:
+            self._checkVersion(storeVersion)
+            best, bestScore = None, self.threshold
+            for entryId in list(self.byContext.get(fingerprint, ())):
+                entry = self.entries[entryId]
+                if entry["expires"] <= now:
+                    self._drop(entryId)
+                    continue
+                score = float(entry["vec"] @ vec)
+                if score >= bestScore:
+                    best, bestScore = entryId, score
+            if best is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(best)
+            self.hits += 1
+            return self.entries[best]["answer"]
+
+    def put(self, queryVector: Sequence[float], fingerprint: str, storeVersion: int, answer: str):
+        vec = self._normalize(queryVector)
+        with self.lock:
+            self._checkVersion(storeVersion)
+            if storeVersion != self.version:
+                return  # answer built on an older corpus than the cache has already seen
+            entryId, self.nextId = self.nextId, self.nextId + 1
+            self.entries[entryId] = {"vec": vec, "fingerprint": fingerprint, "answer": answer,
+                                     "expires": time.monotonic() + self.ttl}
+            self.byContext.setdefault(fingerprint, []).append(entryId)
+            while len(self.entries) > self.maxEntries:
+                self._drop(next(iter(self.entries)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.byContext.clear()
+
+    # ---------- private ----------
+    def _checkVersion(self, storeVersion: int):
+        if self.version is None or storeVersion > self.version:
+            self.entries.clear()
+            self.byContext.clear()
+            self.version = storeVersion
+
+    def _drop(self, entryId: int):
+        entry = self.entries.pop(entryId)
+        ids = self.byContext[entry["fingerprint"]]
+        ids.remove(entryId)
+        if not ids:
+            del self.byContext[entry["fingerprint"]]
+
+    @staticmethod
+    def _normalize(queryVector: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(queryVector, dtype="float32").ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+
+_shared: Optional[AnswerCache] = None
+_sharedLock = threading.Lock()
+
+
+def sharedAnswerCache() -> AnswerCache:
+    """The process-wide cache, so a question answered for one session is reused by the others."""
+    global _shared
+    with _sharedLock:
+        if _shared is None:
+            _shared = AnswerCache()
+        return _shared
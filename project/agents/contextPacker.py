@@ -0,0 +1,51 @@
+# agents/context_packer.py
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from project.documentParsers.chunker import TokenCounter, estimateTokens
+
+CONTEXT_TOKENS = 1024   # prompt tokens spent on retrieved context
+CANDIDATES = 12         # chunks fetched from the store before packing
+MAX_SIMILARITY = 0.92   # cosine similarity above which a chunk repeats a better-ranked one
+
+
+class ContextPacker:
+    """Turns over-fetched search results into the context of one prompt.
+
+    Candidates are taken in rank order; a chunk whose vector is within
+    `maxSimilarity` of a chunk already taken (overlapping windows, the same
+    paragraph in two uploads) is dropped, and chunks are added while they fit
+    in `tokenBudget`. The chosen chunks are then grouped by document, best
+    document first, and put back in reading order within each document.
+    """
+
+    def __init__(self, tokenBudget: int = CONTEXT_TOKENS, candidates: int = CANDIDATES,
+                 maxSimilarity: float = MAX_SIMILARITY, countTokens: Optional[TokenCounter] = None):
+        self.tokenBudget = tokenBudget
+        self.candidates = candidates
+        self.maxSimilarity = maxSimilarity
+        self.countTokens = countTokens or estimateTokens
+
+    def pack(self, results: Sequence[Dict[str, Any]], vectors: np.ndarray) -> Tuple[List[str], Dict[str, int]]:
+        """Return (context chunks, report) for `results` in rank order and their
+        normalized vectors. The report counts candidates, duplicates, chunks over
+        budget, the tokens used and the tokens saved versus sending every candidate."""
+        kept: List[int] = []
+        tokens = [self.countTokens(r["text"]) for r in results]
+        used = duplicates = overBudget = 0
+        for n in range(len(results)):
+            if kept and float(np.max(vectors[kept] @ vectors[n])) >= self.maxSimilarity:
+                duplicates += 1
+                continue
+            if used + tokens[n] > self.tokenBudget:
+                overBudget += 1
+                continue
+            kept.append(n)
+            used += tokens[n]
+
+        sourceRank: Dict[str, int] = {}
+        for n in kept:
+            sourceRank.setdefault(results[n]["source"], len(sourceRank))
+        kept.sort(key=lambda n: (sourceRank[results[n]["source"]], results[n]["id"]))
+        report = {"candidates": len(results), "duplicates": duplicates, "over_budget": overBudget,
+                  "tokens_used": used, "tokens_saved": sum(tokens) - used}
+        return [results[n]["text"] for n in kept], report
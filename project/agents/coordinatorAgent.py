@@ -1,38 +1,83 @@
 from project.mcp.messageBus import MessageBus
 import uuid
+from threading import Lock
 
 class CoordinatorAgent:
     def __init__(self, bus: MessageBus):
         self.bus = bus
         self.name = "CoordinatorAgent"
+        # trace_id -> query waiting for its documents to be indexed
+        self.pending = {}
+        # trace_id -> who asked, so the answer can be routed back to them
+        self.requesters = {}
+        self.lock = Lock()
         self.bus.subscribe(self.name, self.handle_message)
 
     def handle_message(self, msg):
         if msg["type"] == "LLM_RESPONSE" and msg["receiver"] == self.name:
-            print(f"Answer:\n{msg['payload']['answer']}")
-            print(f"Sources:\n{msg['payload']['source_chunks']}")
+            with self.lock:
+                requester = self.requesters.pop(msg["trace_id"], None)
+            if requester is not None:
+                # same trace_id, so a bus.request() waiting on this trace resolves
+                self.bus.send({
+                    "sender":   self.name,
+                    "receiver": requester,
+                    "type":     "USER_RESPONSE",
+                    "trace_id": msg["trace_id"],
+                    "payload":  msg["payload"],
+                })
+        if msg["type"] == "LLM_RESPONSE_CHUNK" and msg["receiver"] == self.name:
+            with self.lock:
+                requester = self.requesters.get(msg["trace_id"])
+            if requester is not None:
+                self.bus.send({**msg, "sender": self.name, "receiver": requester})
+        if msg["type"] == "INGESTION_ACK" and msg["receiver"] == self.name:
+            trace_id = msg["trace_id"]
+            with self.lock:
+                waiting = self.pending.get(trace_id)
+                if waiting is None:
+                    return
+                waiting["remaining"] -= 1
+                if waiting["remaining"] > 0:
+                    return
+                del self.pending[trace_id]
+            self.forward_query(trace_id, waiting["query"], waiting["filters"])
         if msg["type"] == "USER_QUERY" and msg["receiver"] == self.name:
-            trace_id = str(uuid.uuid4())
+            trace_id = msg.get("trace_id") or str(uuid.uuid4())
             query    = msg["payload"]["query"]
+            filters  = msg["payload"].get("filters")
+            with self.lock:
+                self.requesters[trace_id] = msg["sender"]
+            doc_paths = msg["payload"].get("doc_paths") or []
 
-            # ingest only if user supplied a file
-            if "doc_paths" in msg["payload"]:
-                for doc_path in msg["payload"]["doc_paths"]:
-                    ingestion_msg = {
-                        "sender":   self.name,
-                        "receiver": "IngestionAgent",
-                        "type":     "QUERY",
-                        "trace_id": trace_id,
-                        "payload":  {"doc_path": doc_path},
-                    }
-                    self.bus.send(ingestion_msg)
-                
+            if not doc_paths:
+                self.forward_query(trace_id, query, filters)
+                return
 
-            # always forward the question to retrieval
-            self.bus.send({
+            # ingest only if user supplied a file; the question is forwarded once
+            # RetrievalAgent has acknowledged every document (agents may run
+            # concurrently on an async bus, so sending it right away could race
+            # ahead of the indexing)
+            with self.lock:
+                self.pending[trace_id] = {"remaining": 1, "query": query, "filters": filters}
+            ingestion_msg = {
                 "sender":   self.name,
-                "receiver": "RetrievalAgent",
+                "receiver": "IngestionAgent",
                 "type":     "QUERY",
                 "trace_id": trace_id,
-                "payload":  {"query": query},
-            })
+                "payload":  {"doc_paths": doc_paths, "notify": self.name},
+            }
+            self.bus.send(ingestion_msg)
+
+    def forward_query(self, trace_id, query, filters=None):
+        payload = {"query": query}
+        if filters:
+            # restrict retrieval by source, filetype, tags or upload time (see FaissStore.search)
+            payload["filters"] = filters
+        self.bus.send({
+            "sender":   self.name,
+            "receiver": "RetrievalAgent",
+            "type":     "QUERY",
+            "trace_id": trace_id,
+            "payload":  payload,
+        })
@@ -1,19 +1,48 @@
+import os
 import uuid
+from typing import Optional
 from project.mcp.messageBus import MessageBus
 from project.documentParsers.parsers import DocumentParser
+from project.vectorStore.resourceRegistry import getBatchParser, getSourceRegistry
+from project.mcp.tracing import span
+
+STREAM_BYTES = 32 * 1024 * 1024  # files at least this big are parsed and shipped incrementally
+STREAM_BATCH = 256               # chunks per INGESTION_RESULT part when streaming
+STREAM_TIMEOUT = 3600            # seconds a batch waits for a streamed file to be indexed
 
 class IngestionAgent:
-    def __init__(self, bus: MessageBus):
+    def __init__(self, bus: MessageBus, workers: Optional[int] = None,
+                 sources_path: str = "vectorDB/sources.json"):
         self.bus = bus
         self.name = "IngestionAgent"
-        self.bus.subscribe(self.name, self.handle_message)
         self.parser = DocumentParser()
+        # one process pool per process, not per session (see resourceRegistry)
+        self.batchParser = getBatchParser(workers, self.parser)
+        # fingerprints of the files the store has indexed (keep it next to the index,
+        # see FaissStore.sourcesPath); shared by every agent in the process
+        self.registry = getSourceRegistry(sources_path)
+        self.bus.subscribe(self.name, self.handle_message)
 
     def handle_message(self, msg):
+        if msg["type"] == "INGESTION_ACK" and msg["receiver"] == self.name:
+            self.handle_ack(msg)
+            return
         if msg["type"] == "QUERY" and msg["receiver"] == self.name:
+            if "doc_paths" in msg["payload"]:
+                self.ingest_batch(msg)
+                return
             trace_id = msg["trace_id"]
             doc_path = msg["payload"]["doc_path"]
-            chunks = self.parser.parse(doc_path)
+            # skip re-parsing (and re-embedding) documents whose content has not changed
+            unchanged = self.registry.unchanged(doc_path)
+            tags = msg["payload"].get("tags")
+            if not unchanged and (msg["payload"].get("stream") or self.is_large(doc_path)):
+                self.ingest_stream(doc_path, trace_id, msg["payload"].get("notify"), tags=tags)
+                return
+            # taken before parsing, so an edit made meanwhile is picked up next time
+            fingerprints = {} if unchanged else {doc_path: self.registry.fingerprint(doc_path)}
+            with span("parse"):
+                chunks = [] if unchanged else self.parser.parse(doc_path)
             # send parsed chunks to RetrievalAgent
             response = {
                 "sender": self.name,
@@ -22,9 +51,132 @@ class IngestionAgent:
                 "trace_id": trace_id,
                 "payload": {
                     "chunks": chunks,
-                    "source": doc_path
+                    "source": doc_path,
+                    "unchanged": unchanged
                 }
             }
-            print("InjestionAgent: Parsed chunks from document:", response)
+            self.expect_ack(response, fingerprints, msg["payload"].get("notify"))
+            if tags:
+                response["payload"]["tags"] = tags
+            print(f"InjestionAgent: Parsed {len(chunks)} chunks from {doc_path}"
+                  + (" (unchanged)" if unchanged else ""))
             self.bus.send(response)
 
+    def ingest_batch(self, msg):
+        """Parse several documents on the process pool and forward them as one result.
+
+        The sender gets an INGESTION_PROGRESS message each time a file is parsed.
+        """
+        trace_id = msg["trace_id"]
+        doc_paths = msg["payload"]["doc_paths"]
+        tags = msg["payload"].get("tags")
+        changed = [p for p in doc_paths if not self.registry.unchanged(p)]
+        skipped = len(doc_paths) - len(changed)
+        large = [p for p in changed if self.is_large(p)]
+        changed = [p for p in changed if p not in large]
+
+        def progress(done, total, doc_path):
+            self.bus.send({
+                "sender": self.name,
+                "receiver": msg["sender"],
+                "type": "INGESTION_PROGRESS",
+                "trace_id": trace_id,
+                "payload": {"done": skipped + done, "total": len(doc_paths), "source": doc_path}
+            })
+
+        # big files are streamed one by one and indexed before the batch result
+        # goes out, so the final acknowledgement still covers every file
+        for n, doc_path in enumerate(large):
+            self.bus.request(self.ingest_stream(doc_path, trace_id, send_final=False, tags=tags),
+                             timeout=STREAM_TIMEOUT, reply_type="INGESTION_ACK").result()
+            progress(n + 1, len(doc_paths), doc_path)
+        skipped += len(large)
+
+        fingerprints = {p: self.registry.fingerprint(p) for p in changed}
+        with span("parse"):
+            chunk_lists = self.batchParser.parseMany(changed, onProgress=progress)
+        response = {
+            "sender": self.name,
+            "receiver": "RetrievalAgent",
+            "type": "INGESTION_RESULT",
+            "trace_id": trace_id,
+            "payload": {
+                "documents": [{"source": p, "chunks": c} for p, c in zip(changed, chunk_lists)]
+            }
+        }
+        self.expect_ack(response, fingerprints, msg["payload"].get("notify"))
+        if tags:
+            response["payload"]["tags"] = tags
+        print(f"InjestionAgent: Parsed {len(changed)} of {len(doc_paths)} documents "
+              f"({skipped} unchanged)")
+        self.bus.send(response)
+
+    def ingest_stream(self, doc_path, trace_id, notify=None, send_final=True, tags=None):
+        """Parse a (large) document lazily and send its chunks in fixed-size parts.
+
+        Only one part is in memory at a time. The closing message tells
+        RetrievalAgent how many parts to expect before it drops the chunks the
+        new version no longer has. With `send_final=False` the closing message
+        is returned instead of sent, for callers that want to `bus.request` it
+        (its acknowledgement comes back to this agent).
+        """
+        fingerprint = self.registry.fingerprint(doc_path)
+        parts = 0
+        batch = []
+        for chunk in self.parser.iterParse(doc_path):
+            batch.append(chunk)
+            if len(batch) >= STREAM_BATCH:
+                self.send_stream_part(trace_id, doc_path, batch, tags)
+                parts += 1
+                batch = []
+        if batch:
+            self.send_stream_part(trace_id, doc_path, batch, tags)
+            parts += 1
+        final = {
+            "sender": self.name,
+            "receiver": "RetrievalAgent",
+            "type": "INGESTION_RESULT",
+            "trace_id": trace_id,
+            "payload": {"source": doc_path, "stream": True, "final": True, "parts": parts}
+        }
+        self.expect_ack(final, {doc_path: fingerprint}, notify)
+        print(f"InjestionAgent: Streamed {parts} parts from {doc_path}")
+        if not send_final:
+            return final
+        self.bus.send(final)
+
+    def expect_ack(self, response, fingerprints, notify=None):
+        """Address RetrievalAgent's INGESTION_ACK for `response` to this agent when
+        it indexes new files, so their `fingerprints` are only recorded once they
+        are in the store; `handle_ack` then passes the ack on to `notify`."""
+        payload = response["payload"]
+        if fingerprints:
+            payload["notify"] = self.name
+            payload["fingerprints"] = fingerprints
+            if notify:
+                payload["forward_to"] = notify
+        elif notify:
+            payload["notify"] = notify
+
+    def handle_ack(self, msg):
+        payload = dict(msg["payload"])
+        self.registry.recordMany(payload.pop("fingerprints", {}))
+        forward_to = payload.pop("forward_to", None)
+        if forward_to:
+            self.bus.send({**msg, "sender": self.name, "receiver": forward_to, "payload": payload})
+
+    def send_stream_part(self, trace_id, doc_path, chunks, tags=None):
+        payload = {"source": doc_path, "stream": True, "chunks": chunks}
+        if tags:
+            payload["tags"] = tags
+        self.bus.send({
+            "sender": self.name,
+            "receiver": "RetrievalAgent",
+            "type": "INGESTION_RESULT",
+            "trace_id": trace_id,
+            "payload": payload
+        })
+
+    @staticmethod
+    def is_large(doc_path):
+        return os.path.getsize(doc_path) >= STREAM_BYTES
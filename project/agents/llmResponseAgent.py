@@ -1,20 +1,25 @@
 from project.mcp.messageBus import MessageBus
-from project.documentParsers.parsers import DocumentParser
-from google import genai
+from project.agents.answerCache import AnswerCache, contextFingerprint, sharedAnswerCache
+from project.llm.backends import GeminiBackend
+from project.llm.llmPool import LLMPool, sharedPool
+from typing import Optional
 class LLMResponseAgent:
-    def __init__(self, bus: MessageBus, google_api_key: str):
+    def __init__(self, bus: MessageBus, google_api_key: str, cache: Optional[AnswerCache] = None,
+                 stream: bool = False, llm: Optional[LLMPool] = None):
         self.bus = bus
         self.name = "LLMResponseAgent"
-        self.client = genai.Client(api_key=google_api_key)
+        # one Gemini client, concurrency limit and rate limit per API key for the whole process
+        self.llm = llm or sharedPool(f"gemini:{google_api_key}", lambda: GeminiBackend(google_api_key))
+        self.cache = cache or sharedAnswerCache()
+        # send LLM_RESPONSE_CHUNK messages as the model produces text
+        self.stream = stream
         self.bus.subscribe(self.name, self.handle_message)
 
     def handle_message(self, msg):
         if msg["type"] == "RETRIEVAL_RESULT" and msg["receiver"] == self.name:
             context = msg["payload"]["retrieved_context"]
-            query = msg["payload"]["query"]
             trace_id = msg["trace_id"]
-            prompt = self.format_prompt(context, query)
-            response_text = self.call_llm(prompt)
+            response_text, cached = self.answer(msg["payload"], trace_id)
             response = {
                 "sender": self.name,
                 "receiver": "CoordinatorAgent",
@@ -22,17 +27,55 @@ class LLMResponseAgent:
                 "trace_id": trace_id,
                 "payload": {
                     "answer": response_text,
-                    "source_chunks": context
+                    "source_chunks": context,
+                    "cached": cached
                 }
             }
             self.bus.send(response)
 
+    def answer(self, payload, trace_id):
+        """Answer from the cache when the same question was asked against the same
+        context and corpus, otherwise call the LLM; returns (answer, cached)."""
+        context = payload["retrieved_context"]
+        prompt = self.format_prompt(context, payload["query"])
+        vec = payload.get("query_embedding")
+        if vec is None:
+            return self.generate(prompt, trace_id), False
+        fingerprint = contextFingerprint(context)
+        version = payload.get("store_version", 0)
+        response_text = self.cache.get(vec, fingerprint, version)
+        if response_text is not None:
+            return response_text, True
+        response_text = self.generate(prompt, trace_id)
+        self.cache.put(vec, fingerprint, version, response_text)
+        return response_text, False
+
+    def generate(self, prompt, trace_id):
+        if not self.stream:
+            return self.call_llm(prompt)
+        parts = []
+        for text in self.call_llm_stream(prompt):
+            if not parts:
+                text = text.lstrip()
+                if not text:
+                    continue
+            self.bus.send({
+                "sender": self.name,
+                "receiver": "CoordinatorAgent",
+                "type": "LLM_RESPONSE_CHUNK",
+                "trace_id": trace_id,
+                "payload": {"text": text, "index": len(parts)}
+            })
+            parts.append(text)
+        # the final LLM_RESPONSE repeats the whole answer, equal to the chunks joined
+        return "".join(parts)
+
     def format_prompt(self, context, query):
         context_text = "\n---\n".join(context)
         return f"Answer the question based on the following context:\n{context_text}\n\nQuestion: {query}\nAnswer:"
 
     def call_llm(self, prompt):
-        response = self.client.models.generate_content(
-            model="gemini-2.0-flash-lite", contents=[prompt]
-        )
-        return response.text.strip()
+        return self.llm.generate(prompt).strip()
+
+    def call_llm_stream(self, prompt):
+        return self.llm.stream(prompt)
@@ -1,31 +1,156 @@
 from project.mcp.messageBus import MessageBus
-from project.documentParsers.parsers import DocumentParser
-from project.vectorStore.faissStore import FaissStore
+from project.vectorStore.embeddingCache import textHash
+from project.vectorStore.resourceRegistry import getStore
+from project.agents.contextPacker import ContextPacker
+from project.mcp.tracing import span
+from typing import TYPE_CHECKING, Optional, Union
+from threading import Condition, Lock
+import json
+if TYPE_CHECKING:  # faiss is imported once a store is opened
+    from project.vectorStore.faissStore import FaissStore
+    from project.vectorStore.shardedStore import ShardedStore
 
 class RetrievalAgent:
-    def __init__(self, bus: MessageBus):
+    def __init__(self, bus: MessageBus, store: Optional[Union["FaissStore", "ShardedStore"]] = None,
+                 packer: Optional[ContextPacker] = None, batch_window: float = 0.0,
+                 max_batch: int = 32):
         self.bus = bus
         self.name = "RetrievalAgent"
+        # the process-wide store unless one is given: every session searches the same index
+        self.store = store or getStore()
+        self.packer = packer or ContextPacker()
+        # (trace_id, source) -> progress of a document arriving in streamed parts
+        self.streams = {}
+        self.lock = Lock()
+        # QUERY micro-batching: messages arriving within batch_window seconds of
+        # each other are answered with one encode and one FAISS search
+        if batch_window > 0 and bus.async_mode and \
+                bus.limits.get(self.name, {}).get("workers", bus.default_workers) < 2:
+            # the batch leader holds its worker while it waits, so a single worker never coalesces
+            raise ValueError("batch_window needs at least 2 RetrievalAgent workers (bus.configure)")
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.batch = []
+        self.batch_ready = Condition(self.lock)
         self.bus.subscribe(self.name, self.handle_message)
-        self.store = FaissStore()
 
     def handle_message(self, msg):
         if msg["type"] == "INGESTION_RESULT" and msg["receiver"] == self.name:
-            chunks = msg["payload"]["chunks"]
-            source = msg["payload"]["source"]
-            self.store.add(chunks, source)
+            if msg["payload"].get("stream"):
+                stream = self.handle_stream_part(msg)
+                if stream is None:
+                    return
+                # the part that completed the document need not be the closing message
+                msg = stream["final"]
+                ack = {"source": msg["payload"]["source"]}
+            elif "documents" in msg["payload"]:
+                # batch ingestion: embed every new chunk of every document together
+                documents = msg["payload"]["documents"]
+                tags = msg["payload"].get("tags")
+                self.store.upsert_many([(d["source"], d["chunks"]) for d in documents],
+                                       tags={d["source"]: tags for d in documents} if tags else None)
+                ack = {"sources": [d["source"] for d in documents]}
+            else:
+                chunks = msg["payload"]["chunks"]
+                source = msg["payload"]["source"]
+                if not msg["payload"].get("unchanged"):
+                    # replace the document's previous chunks instead of appending next to them
+                    self.store.upsert(source, chunks, msg["payload"].get("tags"))
+                ack = {"source": source}
+            # IngestionAgent records the fingerprints of the files once they are indexed
+            for key in ("fingerprints", "forward_to"):
+                if key in msg["payload"]:
+                    ack[key] = msg["payload"][key]
+            if "notify" in msg["payload"]:
+                self.bus.send({
+                    "sender": self.name,
+                    "receiver": msg["payload"]["notify"],
+                    "type": "INGESTION_ACK",
+                    "trace_id": msg["trace_id"],
+                    "payload": ack
+                })
         elif msg["type"] == "QUERY" and msg["receiver"] == self.name:
-            query = msg["payload"]["query"]
-            trace_id = msg["trace_id"]
-            results = self.store.search(query, k=1)
+            if self.batch_window <= 0:
+                self.answer_queries([msg])
+                return
+            with self.lock:
+                self.batch.append(msg)
+                if len(self.batch) > 1:
+                    # a batch is already open; its leader answers this message too
+                    if len(self.batch) >= self.max_batch:
+                        self.batch_ready.notify()
+                    return
+                # first message of a new batch: collect for up to batch_window seconds
+                self.batch_ready.wait_for(lambda: len(self.batch) >= self.max_batch, self.batch_window)
+                batch, self.batch = self.batch, []
+            try:
+                self.answer_queries(batch)
+            except Exception as exc:
+                # the bus fails the leader's trace when this raises; the others share its fate
+                for m in batch[1:]:
+                    self.bus.fail_trace(m["trace_id"], exc)
+                raise
+
+    def answer_queries(self, msgs):
+        """Retrieve context for a list of QUERY messages with one encode and one
+        search per distinct filter, then send one RETRIEVAL_RESULT per trace_id."""
+        queries = [m["payload"]["query"] for m in msgs]
+        vecs = self.store.embedQueries(queries)
+        version = self.store.version  # read before searching: a later write must invalidate these answers
+        # over-fetch, then keep the distinct chunks that fit the prompt budget
+        groups = {}
+        for n, m in enumerate(msgs):
+            filters = m["payload"].get("filters")
+            groups.setdefault(json.dumps(filters, sort_keys=True), (filters, []))[1].append(n)
+        results = [None] * len(msgs)
+        for filters, members in groups.values():
+            found = self.store.search_batch([queries[n] for n in members], k=self.packer.candidates,
+                                            queryVectors=vecs[members], filters=filters)
+            for n, rows in zip(members, found):
+                results[n] = rows
+        vectors = self.store.vectors([r["id"] for rows in results for r in rows])
+        offset = 0
+        for msg, query, vec, rows in zip(msgs, queries, vecs, results):
+            with span("pack"):
+                context, report = self.packer.pack(rows, vectors[offset:offset + len(rows)])
+            offset += len(rows)
             response = {
                 "sender": self.name,
                 "receiver": "LLMResponseAgent",
                 "type": "RETRIEVAL_RESULT",
-                "trace_id": trace_id,
+                "trace_id": msg["trace_id"],
                 "payload": {
-                    "retrieved_context": [r["text"] for r in results],
-                    "query": query
+                    "retrieved_context": context,
+                    "context_report": report,
+                    "query": query,
+                    # lets LLMResponseAgent reuse the answer to a near-identical question
+                    "query_embedding": vec.tolist(),
+                    "store_version": version
                 }
             }
             self.bus.send(response)
+
+    def handle_stream_part(self, msg):
+        """Store one part of a streamed document; returns its state once the whole document is in.
+
+        Parts may be handled concurrently and out of order on an async bus, so
+        the closing message only carries the part count and whichever message
+        completes the set prunes the chunks the new version no longer has.
+        """
+        key = (msg["trace_id"], msg["payload"]["source"])
+        if not msg["payload"].get("final"):
+            chunks = msg["payload"]["chunks"]
+            self.store.add(chunks, key[1], msg["payload"].get("tags"))
+        with self.lock:
+            stream = self.streams.setdefault(key, {"keep": set(), "done": 0, "expected": None, "final": None})
+            if msg["payload"].get("final"):
+                stream["expected"] = msg["payload"]["parts"]
+                stream["final"] = msg
+            else:
+                stream["keep"].update(textHash(c) for c in chunks)
+                stream["done"] += 1
+            if stream["expected"] is None or stream["done"] < stream["expected"]:
+                return None
+            del self.streams[key]
+        self.store.prune(key[1], stream["keep"])
+        return stream
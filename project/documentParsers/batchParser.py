@@ -0,0 +1,118 @@
+# document_parsers/batch_parser.py
+from typing import Callable, Dict, List, Optional, Sequence
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from project.documentParsers.parsers import DocumentParser, PAGED_TYPES, PAGE_BREAK
+
+PAGES_PER_TASK = 16  # PDF pages / PPTX slides handed to one worker at a time
+
+ProgressCallback = Callable[[int, int, str], None]  # (files done, files total, path)
+
+_parser = None  # one DocumentParser per worker process
+
+
+def _initWorker(options: dict):
+    global _parser
+    _parser = DocumentParser(**options)
+
+
+def _worker():
+    global _parser
+    if _parser is None:
+        _parser = DocumentParser()
+    return _parser
+
+
+def _parseFile(filePath: str) -> List[str]:
+    return _worker().parse(filePath)
+
+
+def _parseRange(filePath: str, start: int, stop: int) -> List[str]:
+    return _worker().parsePages(filePath, start, stop)
+
+
+class BatchParser:
+    """Parses a batch of documents in parallel on a process pool.
+
+    Each file is one task, except large PDFs/PPTX which are split into page
+    ranges so a single big document also uses several cores. Page texts are
+    stitched back together in order before chunking, so the chunks are exactly
+    what ``DocumentParser.parse`` returns for each file. Workers chunk with the
+    same settings as `parser`.
+    """
+
+    def __init__(self, workers: Optional[int] = None, pagesPerTask: int = PAGES_PER_TASK,
+                 parser: Optional[DocumentParser] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pagesPerTask = pagesPerTask
+        self.parser = parser or DocumentParser()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._poolLock = threading.Lock()  # agents of several sessions may share one parser
+
+    # ---------- public ----------
+    def parseMany(self, filePaths: Sequence[str],
+                  onProgress: Optional[ProgressCallback] = None) -> List[List[str]]:
+        """Chunks of every file, in the order of `filePaths`."""
+        if self.workers <= 1 or not filePaths:
+            return self._parseSerial(filePaths, onProgress)
+
+        pool = self._getPool()
+        futures: Dict = {}
+        ranges: Dict[int, List[Optional[List[str]]]] = {}  # file -> page texts per range
+        for n, path in enumerate(filePaths):
+            pages = self._pageCount(path)
+            if pages > self.pagesPerTask:
+                starts = range(0, pages, self.pagesPerTask)
+                ranges[n] = [None] * len(starts)
+                for r, start in enumerate(starts):
+                    stop = min(start + self.pagesPerTask, pages)
+                    futures[pool.submit(_parseRange, path, start, stop)] = (n, r)
+            else:
+                futures[pool.submit(_parseFile, path)] = (n, None)
+
+        results: List[Optional[List[str]]] = [None] * len(filePaths)
+        done = 0
+        for future in as_completed(futures):
+            n, r = futures[future]
+            if r is None:
+                results[n] = future.result()
+            else:
+                ranges[n][r] = future.result()
+                if any(part is None for part in ranges[n]):
+                    continue
+                pages = [page for part in ranges.pop(n) for page in part]
+                results[n] = self.parser.chunkText(PAGE_BREAK.join(pages))
+            done += 1
+            if onProgress:
+                onProgress(done, len(filePaths), filePaths[n])
+        return results
+
+    def close(self):
+        with self._poolLock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    # ---------- private ----------
+    def _parseSerial(self, filePaths, onProgress):
+        results = []
+        for n, path in enumerate(filePaths):
+            results.append(self.parser.parse(path))
+            if onProgress:
+                onProgress(n + 1, len(filePaths), path)
+        return results
+
+    def _pageCount(self, filePath: str) -> int:
+        if os.path.splitext(filePath)[1].lower() not in PAGED_TYPES:
+            return 0
+        return self.parser.pageCount(filePath)
+
+    def _getPool(self) -> ProcessPoolExecutor:
+        with self._poolLock:
+            if self._pool is None:
+                # spawn, not fork: the parent runs threads (bus workers, torch) that fork would copy mid-flight
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_initWorker, initargs=(self.parser.options,))
+            return self._pool
@@ -0,0 +1,179 @@
+# document_parsers/chunker.py
+from typing import Callable, List, Optional, Tuple
+import re
+
+# e5-small-v2 reads at most 512 tokens (including [CLS]/[SEP] and the
+# "passage: " prefix); 256 keeps chunks focused and leaves room for the
+# token estimate being off
+CHUNK_TOKENS = 256
+CHUNK_OVERLAP = 32
+
+# scripts written without spaces between words (kana, CJK ideographs, Thai,
+# Lao, Myanmar, Khmer): the tokenizer reads them about one character at a time
+_UNSPACED = "\u0e00-\u0eff\u1000-\u109f\u1780-\u17ff\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_LONG_RUN = 16  # characters from which a word is counted by length (URLs, base64, hashes)
+
+# sentence ends (., ! or ? followed by whitespace, or a full-width 。！？) and
+# paragraph breaks (blank lines)
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])\s*|\n[ \t\r\f\v]*\n\s*")
+_TOKEN = re.compile(rf"[{_UNSPACED}]|[^\W{_UNSPACED}]+|[^\w\s]")
+_LONG_WORD = re.compile(rf"[^\W{_UNSPACED}]{{8,}}")
+_RUN = re.compile(rf"[^\W{_UNSPACED}]{{{_LONG_RUN},}}")
+_MAX_PENDING = 32  # characters per budget token buffered while waiting for a boundary
+
+TokenCounter = Callable[[str], int]
+
+
+def estimateTokens(text: str) -> int:
+    """Rough WordPiece count: one token per word, punctuation mark or character
+    of an unspaced script, plus one for words of 8+ characters (which usually
+    split into sub-words); runs of 16+ characters count one token per three."""
+    return (len(_TOKEN.findall(text)) + len(_LONG_WORD.findall(text))
+            + sum(len(run) // 3 - 2 for run in _RUN.findall(text)))
+
+
+def modelTokenCounter(modelName: str) -> TokenCounter:
+    """Exact counts from the embedding model's own (fast, Rust) tokenizer."""
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(modelName)
+    return lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+class TokenChunker:
+    """Splits text into chunks of at most ``maxTokens`` tokens.
+
+    Text is cut into sentences and paragraphs in one regex pass, then the
+    sentences are packed greedily into chunks. A chunk closes early at a
+    paragraph break once it is half full, the next chunk repeats up to
+    ``overlap`` tokens of trailing sentences, and a sentence longer than the
+    budget is split between words (or inside a word longer than the budget). Every character is scanned a constant
+    number of times, so the cost is linear in the input size.
+    """
+
+    def __init__(self, maxTokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP,
+                 countTokens: Optional[TokenCounter] = None):
+        if not 0 <= overlap < maxTokens:
+            raise ValueError("overlap must be smaller than maxTokens")
+        self.maxTokens = maxTokens
+        self.overlap = overlap
+        self.countTokens = countTokens or estimateTokens
+
+    def chunk(self, text: str) -> List[str]:
+        stream = self.stream()
+        return stream.feed(text) + stream.finish()
+
+    def stream(self) -> "ChunkStream":
+        """A fresh incremental chunker for text that arrives in pieces."""
+        return ChunkStream(self)
+
+
+class ChunkStream:
+    """Incremental state of a `TokenChunker`: `feed` pieces, then `finish`.
+
+    Only the unfinished sentence and the sentences of the open chunk are kept,
+    so memory stays bounded however much text goes through.
+    """
+
+    def __init__(self, chunker: TokenChunker):
+        self.chunker = chunker
+        self.pending = ""  # text after the last boundary seen so far
+        self.units: List[Tuple[str, int]] = []  # (sentence, tokens) of the open chunk
+        self.tokens = 0
+        self.out: List[str] = []
+
+    def feed(self, text: str) -> List[str]:
+        data = self.pending + text
+        start = 0
+        for m in _BOUNDARY.finditer(data):
+            self._sentence(data[start:m.start()], paragraphEnd=m.group().count("\n") >= 2)
+            start = m.end()
+        # no boundary for a long stretch (tables, code, unspaced text): cut the
+        # buffer into windows at a space, or mid-word if a window has none, so
+        # it never holds more than `limit` characters
+        limit = _MAX_PENDING * self.chunker.maxTokens
+        while len(data) - start > limit:
+            cut = data.rfind(" ", start + 1, start + limit)
+            end = cut if cut > 0 else start + limit
+            self._sentence(data[start:end], paragraphEnd=False)
+            start = end + 1 if cut > 0 else end
+        self.pending = data[start:]
+        return self._drain()
+
+    def finish(self) -> List[str]:
+        self._sentence(self.pending, paragraphEnd=True)
+        self.pending = ""
+        self._emit(keepOverlap=False)
+        return self._drain()
+
+    # -------- helper --------
+    def _sentence(self, text: str, paragraphEnd: bool):
+        text = " ".join(text.split())
+        if text:
+            tokens = self.chunker.countTokens(text)
+            if tokens > self.chunker.maxTokens:
+                for piece, pieceTokens in self._splitWords(text):
+                    self._add(piece, pieceTokens)
+            else:
+                self._add(text, tokens)
+        if paragraphEnd and self.tokens >= self.chunker.maxTokens // 2:
+            self._emit(keepOverlap=False)
+
+    def _add(self, text: str, tokens: int):
+        if self.units and self.tokens + tokens > self.chunker.maxTokens:
+            self._emit(keepOverlap=True)
+            # drop overlap sentences that would not leave room for this one
+            while self.units and self.tokens + tokens > self.chunker.maxTokens:
+                self.tokens -= self.units.pop(0)[1]
+        self.units.append((text, tokens))
+        self.tokens += tokens
+
+    def _emit(self, keepOverlap: bool):
+        if not self.units:
+            return
+        self.out.append(" ".join(t for t, _ in self.units))
+        if not keepOverlap or not self.chunker.overlap:
+            self.units, self.tokens = [], 0
+            return
+        kept, total = [], 0
+        for unit in reversed(self.units):
+            if total + unit[1] > self.chunker.overlap:
+                break
+            kept.append(unit)
+            total += unit[1]
+        self.units, self.tokens = kept[::-1], total
+
+    def _splitWords(self, text: str):
+        """Windows of whole words within the budget, for sentences that exceed it."""
+        count = self.chunker.countTokens
+        words, tokens = [], 0
+        for word in text.split(" "):
+            n = count(word)
+            if words and tokens + n > self.chunker.maxTokens:
+                yield " ".join(words), tokens
+                words, tokens = [], 0
+            if n > self.chunker.maxTokens:
+                yield from self._splitChars(word, n)
+                continue
+            words.append(word)
+            tokens += n
+        if words:
+            yield " ".join(words), tokens
+
+    def _splitChars(self, word: str, tokens: int):
+        """Pieces of a single word over the budget (unspaced text, URLs, base64),
+        cut by character count at the word's average characters per token."""
+        count, limit = self.chunker.countTokens, self.chunker.maxTokens
+        step = max(1, len(word) * limit // tokens)
+        start = 0
+        while start < len(word):
+            piece = word[start:start + step]
+            n = count(piece)
+            while n > limit and len(piece) > 1:
+                piece = piece[:len(piece) * limit // n or 1]
+                n = count(piece)
+            yield piece, n
+            start += len(piece)
+
+    def _drain(self) -> List[str]:
+        out, self.out = self.out, []
+        return out
@@ -1,14 +1,32 @@
 # document_parsers/parser.py
-import os, re, textwrap
-from typing import List
-import pandas as pd
-import docx, pptx
-from PyPDF2 import PdfReader
+import os
+from typing import Iterable, Iterator, List, Optional
+from project.documentParsers.chunker import CHUNK_OVERLAP, CHUNK_TOKENS, TokenChunker, modelTokenCounter
+
+PAGED_TYPES = {".pdf", ".pptx"}  # formats that can be parsed a page/slide range at a time
+PAGE_BREAK = "\n\n"   # between pages, slides and DOCX paragraphs; the chunker treats it as a paragraph end
+TXT_BLOCK = 1 << 20    # characters read per step when streaming a text file
+CSV_ROWS = 10_000      # rows per block when streaming a CSV
 
-CHUNK_SIZE = 500  # ~500 tokens ≈ 750‑800 characters
 
 class DocumentParser:
-    """Unified parser for PDF, DOCX, PPTX, CSV, TXT / MD."""
+    """Unified parser for PDF, DOCX, PPTX, CSV, TXT / MD.
+
+    Text is split into chunks of at most `maxTokens` tokens that end on
+    sentence or paragraph boundaries and overlap by `overlap` tokens. Tokens
+    are estimated from words and punctuation; pass `tokenizer` (a Hugging Face
+    model name) to count with that model's tokenizer instead.
+
+    The library for each format (PyPDF2, python-docx, python-pptx, pandas) is
+    imported the first time a file of that format is read, so importing the
+    parser stays cheap.
+    """
+
+    def __init__(self, maxTokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP,
+                 tokenizer: Optional[str] = None):
+        self.options = {"maxTokens": maxTokens, "overlap": overlap, "tokenizer": tokenizer}
+        counter = modelTokenCounter(tokenizer) if tokenizer else None
+        self.chunker = TokenChunker(maxTokens, overlap, counter)
 
     def parse(self, filePath: str) -> List[str]:
         ext = os.path.splitext(filePath)[1].lower()
@@ -22,29 +40,85 @@ class DocumentParser:
             return self._parseCsv(filePath)
         return self._parseTxt(filePath)  # default
 
+    def iterParse(self, filePath: str) -> Iterator[str]:
+        """Yield the chunks of `filePath` one at a time (pages, paragraphs, slides,
+        CSV row blocks or text blocks are read lazily), for files too big to parse
+        in one go. Chunks match `parse` except at CSV block boundaries, where
+        column padding is computed per block."""
+        ext = os.path.splitext(filePath)[1].lower()
+        if ext == ".pdf":
+            from PyPDF2 import PdfReader
+            pieces = ((page.extract_text() or "") + PAGE_BREAK for page in PdfReader(filePath).pages)
+        elif ext == ".docx":
+            import docx
+            pieces = (p.text + PAGE_BREAK for p in docx.Document(filePath).paragraphs)
+        elif ext == ".pptx":
+            pieces = (slide + PAGE_BREAK for slide in self._pptxSlides(filePath, 0, None))
+        elif ext == ".csv":
+            pieces = (block + "\n" for block in self._csvBlocks(filePath))
+        else:
+            pieces = self._txtBlocks(filePath)
+        return self._chunkStream(pieces)
+
+    def pageCount(self, filePath: str) -> int:
+        """Pages (PDF) or slides (PPTX) in the file; 0 for formats parsed as a whole."""
+        ext = os.path.splitext(filePath)[1].lower()
+        if ext == ".pdf":
+            from PyPDF2 import PdfReader
+            return len(PdfReader(filePath).pages)
+        if ext == ".pptx":
+            import pptx
+            return len(pptx.Presentation(filePath).slides)
+        return 0
+
+    def parsePages(self, filePath: str, start: int, stop: int) -> List[str]:
+        """Raw text of pages/slides [start, stop) of a PDF or PPTX, one string per page.
+
+        Joining the texts of consecutive ranges with `PAGE_BREAK` and passing the result
+        to `chunkText` gives exactly the chunks `parse` would produce.
+        """
+        ext = os.path.splitext(filePath)[1].lower()
+        if ext == ".pdf":
+            return self._pdfPages(filePath, start, stop)
+        if ext == ".pptx":
+            return self._pptxSlides(filePath, start, stop)
+        raise ValueError(f"{filePath} is not a paged document")
+
+    def chunkText(self, text: str) -> List[str]:
+        return self._chunk(text)
+
     # -------- specific parsers --------
     def _parsePdf(self, filePath):
+        return self._chunk(PAGE_BREAK.join(self._pdfPages(filePath, 0, None)))
+
+    def _pdfPages(self, filePath, start, stop):
+        from PyPDF2 import PdfReader
         reader = PdfReader(filePath)
-        text = "\n".join(page.extract_text() or "" for page in reader.pages)
-        return self._chunk(text)
+        return [page.extract_text() or "" for page in reader.pages[start:stop]]
 
     def _parseDocx(self, filePath):
+        import docx
         doc = docx.Document(filePath)
-        text = "\n".join(p.text for p in doc.paragraphs)
+        text = PAGE_BREAK.join(p.text for p in doc.paragraphs)
         return self._chunk(text)
 
     def _parsePptx(self, filePath):
+        return self._chunk(PAGE_BREAK.join(self._pptxSlides(filePath, 0, None)))
+
+    def _pptxSlides(self, filePath, start, stop):
+        import pptx
         prs = pptx.Presentation(filePath)
         slides = []
-        for slide in prs.slides:
+        for slide in list(prs.slides)[start:stop]:
             slideText = []
             for shape in slide.shapes:
                 if hasattr(shape, "text"):
                     slideText.append(shape.text)
             slides.append("\n".join(slideText))
-        return self._chunk("\n".join(slides))
+        return slides
 
     def _parseCsv(self, filePath):
+        import pandas as pd
         df = pd.read_csv(filePath, dtype=str)
         return self._chunk(df.to_string(index=False))
 
@@ -53,11 +127,38 @@ class DocumentParser:
             text = f.read()
         return self._chunk(text)
 
+    def _csvBlocks(self, filePath):
+        import pandas as pd
+        reader = pd.read_csv(filePath, dtype=str, chunksize=CSV_ROWS)
+        for n, block in enumerate(reader):
+            yield block.to_string(index=False, header=n == 0)
+
+    def _txtBlocks(self, filePath):
+        # cut blocks at whitespace so no word is split across two pieces
+        carry = ""
+        with open(filePath, "r", encoding="utf-8") as f:
+            for block in iter(lambda: f.read(TXT_BLOCK), ""):
+                block = carry + block
+                cut = max(block.rfind(c) for c in " \t\r\n")
+                if cut < 0:
+                    if len(block) < TXT_BLOCK:
+                        carry = block
+                        continue
+                    cut = len(block)  # a whole block without whitespace: pass it on, mid-word
+                yield block[:cut]
+                carry = block[cut:]
+        if carry:
+            yield carry
+
     # -------- helper --------
-    def _chunk(self, text: str):
-        # remove multiple spaces, limit chunk size
-        cleaned = re.sub(r"\s+", " ", text).strip()
-        return textwrap.wrap(cleaned, CHUNK_SIZE)
+    def _chunkStream(self, pieces: Iterable[str]) -> Iterator[str]:
+        stream = self.chunker.stream()
+        for piece in pieces:
+            yield from stream.feed(piece)
+        yield from stream.finish()
+
+    def _chunk(self, text: str) -> List[str]:
+        return self.chunker.chunk(text)
 
 
 
@@ -0,0 +1,115 @@
+# document_parsers/source_registry.py
+from typing import Any, Dict, Optional
+import os, json, hashlib, tempfile, threading
+try:
+    import fcntl
+except ImportError:  # Windows: only writers inside this process are serialized
+    fcntl = None
+
+Fingerprint = Dict[str, Any]  # {"size", "mtime", "sha256"}
+
+
+class SourceRegistry:
+    """Fingerprints (size, mtime, sha256) of every document that has been indexed.
+
+    Size and mtime are checked first; the content hash is only computed when
+    they differ, so an unchanged file costs one ``stat`` and a file that was
+    merely re-saved (same bytes, new mtime) is still recognised as unchanged.
+
+    Several registries (one per process, see ``resourceRegistry.getSourceRegistry``)
+    may share the file: each write merges its own changes into what is on disk
+    under an exclusive lock, and each lookup reloads the file when another
+    writer has replaced it.
+    """
+
+    def __init__(self, path: str = "vectorDB/sources.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Fingerprint] = {}
+        self._loaded: Optional[tuple] = None  # (inode, mtime) of the file `entries` was read from
+        with self.lock:
+            self._reload()
+
+    # ---------- public ----------
+    def unchanged(self, filePath: str) -> bool:
+        """True when `filePath` has the same content as when it was last recorded."""
+        st = os.stat(filePath)
+        with self.lock:
+            self._reload()
+            known = self.entries.get(filePath)
+        if known is None or known["size"] != st.st_size:
+            return False
+        if known["mtime"] == st.st_mtime_ns:
+            return True
+        if known["sha256"] != self._hash(filePath):
+            return False
+        self.record(filePath, self.fingerprint(filePath, known["sha256"]))  # same bytes, newer mtime
+        return True
+
+    def fingerprint(self, filePath: str, sha256: Optional[str] = None) -> Fingerprint:
+        """The current fingerprint of `filePath`, for a later `record`."""
+        st = os.stat(filePath)
+        return {"size": st.st_size, "mtime": st.st_mtime_ns, "sha256": sha256 or self._hash(filePath)}
+
+    def record(self, filePath: str, fingerprint: Optional[Fingerprint] = None):
+        self.recordMany({filePath: fingerprint or self.fingerprint(filePath)})
+
+    def recordMany(self, fingerprints: Dict[str, Fingerprint]):
+        """Record several files with one write of the registry file."""
+        if fingerprints:
+            self._persist(fingerprints)
+
+    def forget(self, filePath: str):
+        with self.lock:
+            self._reload()
+            known = filePath in self.entries
+        if known:
+            self._persist({filePath: None})
+
+    # ---------- private ----------
+    @staticmethod
+    def _hash(filePath: str) -> str:
+        h = hashlib.sha256()
+        with open(filePath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def _reload(self, force: bool = False):
+        """Re-read the file if it was replaced since it was last read (caller holds the lock)."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                st = os.fstat(f.fileno())
+                if force or (st.st_ino, st.st_mtime_ns) != self._loaded:
+                    self.entries = json.load(f)
+                    self._loaded = (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:  # never written, or wiped along with the index
+            self.entries, self._loaded = {}, None
+
+    def _persist(self, changes: Dict[str, Optional[Fingerprint]]):
+        """Apply `changes` (None removes an entry) to the file and to `entries`."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self.lock, open(self.path + ".lock", "a") as lockFile:
+            if fcntl is not None:
+                fcntl.flock(lockFile, fcntl.LOCK_EX)  # released when the file closes
+            self._reload(force=True)
+            entries = dict(self.entries)
+            for filePath, fingerprint in changes.items():
+                if fingerprint is None:
+                    entries.pop(filePath, None)
+                else:
+                    entries[filePath] = fingerprint
+            if entries == self.entries:
+                return
+            fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self.entries = entries
+            st = os.stat(self.path)
+            self._loaded = (st.st_ino, st.st_mtime_ns)
@@ -0,0 +1,108 @@
+# llm/backends.py
+from typing import Iterator, Optional
+import time, threading
+
+GEMINI_MODEL = "gemini-2.0-flash-lite"
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMBackend:
+    """One way of turning a prompt into text. Subclasses implement `stream`;
+    `generate` joins the streamed pieces unless overridden."""
+
+    name = "backend"
+
+    def generate(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        raise NotImplementedError
+
+    @staticmethod
+    def retryable(exc: BaseException) -> bool:
+        """True for errors worth retrying: timeouts, dropped connections, quota and server errors."""
+        if isinstance(exc, (TimeoutError, ConnectionError)):
+            return True
+        code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+        return code in RETRYABLE_CODES
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through one ``genai.Client``, whose HTTP connections are
+    reused by every call. `timeout` (seconds) bounds each request. The client
+    (and google-genai) is only loaded by the first call."""
+
+    name = "gemini"
+
+    def __init__(self, apiKey: Optional[str] = None, model: str = GEMINI_MODEL,
+                 timeout: float = 30.0, client=None):
+        self.model = model
+        self.apiKey = apiKey
+        self.timeout = timeout
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                from google.genai import types
+                self._client = genai.Client(api_key=self.apiKey,
+                                            http_options=types.HttpOptions(timeout=int(self.timeout * 1000)))
+            return self._client
+
+    def generate(self, prompt: str) -> str:
+        response = self.client.models.generate_content(model=self.model, contents=[prompt])
+        return response.text or ""
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.client.models.generate_content_stream(model=self.model, contents=[prompt]):
+            if chunk.text:
+                yield chunk.text
+
+    @staticmethod
+    def retryable(exc: BaseException) -> bool:
+        """Also true for what google-genai raises: httpx timeouts and dropped
+        connections (not subclasses of the builtin errors) and an ``APIError``
+        with a retryable status code."""
+        if LLMBackend.retryable(exc):
+            return True
+        try:
+            import httpx
+            from google.genai import errors
+        except ImportError:  # no google-genai, so nothing of it was raised
+            return False
+        if isinstance(exc, errors.APIError):
+            return exc.code in RETRYABLE_CODES
+        return isinstance(exc, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError))
+
+
+class StubError(Exception):
+    """Error raised by `StubBackend`, carrying an HTTP-like status code."""
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+class StubBackend(LLMBackend):
+    """Offline backend for load tests: answers after `latency` seconds, streams
+    word by word, and fails a call with a 429 every `failEvery` calls."""
+
+    name = "stub"
+
+    def __init__(self, answer: Optional[str] = None, latency: float = 0.3,
+                 tokenDelay: float = 0.02, failEvery: int = 0):
+        from project.llm.fakeClient import FakeClient
+        self.client = FakeClient(answer, firstTokenDelay=latency, tokenDelay=tokenDelay)
+        self.failEvery = failEvery
+        self.calls = 0
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        self.calls += 1
+        if self.failEvery and self.calls % self.failEvery == 0:
+            time.sleep(self.client.firstTokenDelay)
+            raise StubError("stub quota exceeded", 429)
+        for chunk in self.client.models.generate_content_stream(model="stub", contents=[prompt]):
+            yield chunk.text
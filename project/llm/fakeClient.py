@@ -0,0 +1,49 @@
+# llm/fake_client.py
+from typing import Iterator, List, Optional
+import time
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Models:
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+
+    def generate_content(self, model: str, contents: List[str], **kwargs) -> _Response:
+        return _Response("".join(c.text for c in self.generate_content_stream(model, contents)))
+
+    def generate_content_stream(self, model: str, contents: List[str], **kwargs) -> Iterator[_Response]:
+        self.client.calls += 1
+        if self.client.firstTokenDelay:
+            time.sleep(self.client.firstTokenDelay)
+        words = self.client.reply(contents[-1]).split(" ")
+        for n, word in enumerate(words):
+            if n and self.client.tokenDelay:
+                time.sleep(self.client.tokenDelay)
+            yield _Response(word if n == len(words) - 1 else word + " ")
+
+
+class FakeClient:
+    """Offline stand-in for ``genai.Client`` with the same ``models`` interface.
+
+    Answers are deterministic (an echo of the question unless `answer` is
+    given) and streamed one word at a time, with `firstTokenDelay` before the
+    first word and `tokenDelay` between words to imitate a real model.
+    """
+
+    def __init__(self, answer: Optional[str] = None, firstTokenDelay: float = 0.3,
+                 tokenDelay: float = 0.02):
+        self.answer = answer
+        self.firstTokenDelay = firstTokenDelay
+        self.tokenDelay = tokenDelay
+        self.calls = 0
+        self.models = _Models(self)
+
+    def reply(self, prompt: str) -> str:
+        if self.answer is not None:
+            return self.answer
+        question = prompt.rsplit("Question:", 1)[-1].split("\nAnswer:", 1)[0].strip()
+        return f"This is a fake answer to: {question}"
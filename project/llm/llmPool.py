@@ -0,0 +1,172 @@
+# llm/llm_pool.py
+from collections import deque
+from typing import Callable, Dict, Iterator, Optional
+import time, random, threading
+from project.llm.backends import LLMBackend
+from project.mcp.tracing import span
+
+MAX_CONCURRENT = 4    # requests in flight at once
+RATE_PER_SEC = 5.0    # sustained requests per second (token bucket refill rate)
+BURST = 10            # requests allowed back to back before the rate applies
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5    # seconds before the first retry, doubled every attempt
+BACKOFF_MAX = 8.0
+LATENCY_WINDOW = 1024  # latest calls kept for the percentiles
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and up to `capacity` at once."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns the time waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class LLMMetrics:
+    """Thread-safe call counters plus latency and time-to-first-token percentiles."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"calls": 0, "ok": 0, "failed": 0, "retries": 0, "throttled": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.firstTokens = deque(maxlen=LATENCY_WINDOW)
+
+    def count(self, key: str, n: int = 1):
+        with self.lock:
+            self.counts[key] += n
+
+    def observe(self, latency: float, firstToken: Optional[float] = None):
+        with self.lock:
+            self.latencies.append(latency)
+            if firstToken is not None:
+                self.firstTokens.append(firstToken)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            out = dict(self.counts)
+            for name, values in (("latency", self.latencies), ("first_token", self.firstTokens)):
+                ordered = sorted(values)
+                for p in (50, 95, 99):
+                    out[f"{name}_p{p}"] = ordered[min(len(ordered) - 1, len(ordered) * p // 100)] if ordered else 0.0
+        return out
+
+
+class LLMPool:
+    """Calls an `LLMBackend` with bounded concurrency, rate limiting and retries.
+
+    At most `maxConcurrent` calls run at once (the rest wait for a slot), each
+    call first takes a token from a bucket refilled at `ratePerSec`, and errors
+    the backend marks as retryable (timeouts, 429, 5xx) are retried up to
+    `maxRetries` times with jittered exponential backoff. A stream is only
+    retried before its first piece of text, so callers never see text twice.
+    """
+
+    def __init__(self, backend: LLMBackend, maxConcurrent: int = MAX_CONCURRENT,
+                 ratePerSec: float = RATE_PER_SEC, burst: int = BURST, maxRetries: int = MAX_RETRIES,
+                 backoffBase: float = BACKOFF_BASE, backoffMax: float = BACKOFF_MAX):
+        self.backend = backend
+        self.slots = threading.BoundedSemaphore(maxConcurrent)
+        self.bucket = TokenBucket(ratePerSec, burst)
+        self.maxRetries = maxRetries
+        self.backoffBase = backoffBase
+        self.backoffMax = backoffMax
+        self.metrics = LLMMetrics()
+
+    # ---------- public ----------
+    def generate(self, prompt: str) -> str:
+        with span("llm"):
+            return self._call(lambda: self.backend.generate(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        with span("llm"):
+            yield from self._stream(prompt)
+
+    # ---------- private ----------
+    def _stream(self, prompt: str) -> Iterator[str]:
+        for attempt in range(self.maxRetries + 1):
+            started = False
+            with self.slots:
+                self._admit()
+                begin = time.perf_counter()
+                firstToken = None
+                try:
+                    for text in self.backend.stream(prompt):
+                        if firstToken is None:
+                            firstToken = time.perf_counter() - begin
+                        started = True
+                        yield text
+                except Exception as exc:
+                    if started or not self._shouldRetry(exc, attempt):
+                        self.metrics.count("failed")
+                        raise
+                else:
+                    self.metrics.count("ok")
+                    self.metrics.observe(time.perf_counter() - begin, firstToken)
+                    return
+            self._backoff(attempt)
+
+    def _call(self, fn: Callable[[], str]) -> str:
+        for attempt in range(self.maxRetries + 1):
+            with self.slots:
+                self._admit()
+                begin = time.perf_counter()
+                try:
+                    result = fn()
+                except Exception as exc:
+                    if not self._shouldRetry(exc, attempt):
+                        self.metrics.count("failed")
+                        raise
+                else:
+                    latency = time.perf_counter() - begin
+                    self.metrics.count("ok")
+                    self.metrics.observe(latency, latency)
+                    return result
+            self._backoff(attempt)
+
+    def _admit(self):
+        self.metrics.count("calls")
+        if self.bucket.acquire() > 0:
+            self.metrics.count("throttled")
+
+    def _shouldRetry(self, exc: BaseException, attempt: int) -> bool:
+        if attempt >= self.maxRetries or not self.backend.retryable(exc):
+            return False
+        self.metrics.count("retries")
+        print(f"LLMPool: {self.backend.name} call failed ({exc!r}), retrying")
+        return True
+
+    def _backoff(self, attempt: int):
+        delay = min(self.backoffMax, self.backoffBase * 2 ** attempt)
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+_pools: Dict[str, LLMPool] = {}
+_poolsLock = threading.Lock()
+
+
+def sharedPool(key: str, factory: Callable[[], LLMBackend], **options) -> LLMPool:
+    """The process-wide pool for `key` (e.g. an API key), so every session shares
+    one client, one concurrency limit and one rate limit. `factory` and
+    `options` are only used the first time."""
+    with _poolsLock:
+        if key not in _pools:
+            _pools[key] = LLMPool(factory(), **options)
+        return _pools[key]
@@ -1,20 +1,386 @@
-from typing import Callable, Dict, List
-from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+from threading import Lock, Thread, Timer
+from concurrent.futures import Future, TimeoutError as RequestTimeout
+import atexit, multiprocessing, queue, time, zlib
+import traceback
+from collections import OrderedDict
+from multiprocessing.connection import Listener
+from project.mcp.transport import AgentFactory, Link, runWorker
+from project.mcp.tracing import Tracer
+
+ORIGINS = 4096  # (agent, trace_id) pairs remembered to route replies back to the sending process
+
+class _Inbox:
+    """Bounded queue of messages for one agent, drained by a fixed pool of worker threads."""
+
+    def __init__(self, agent_name: str, bus: "MessageBus", workers: int, max_queue: int):
+        self.agent_name = agent_name
+        self.bus = bus
+        # (message, time it was queued)
+        self.queue: "queue.Queue[Optional[Tuple[dict, float]]]" = queue.Queue(maxsize=max_queue)
+        self.threads = [Thread(target=self._work, name=f"{agent_name}-worker-{i}", daemon=True)
+                        for i in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:  # shutdown sentinel
+                    return
+                self.bus._dispatch(self.agent_name, *item)
+            finally:
+                self.queue.task_done()
+
 
 class MessageBus:
-    def __init__(self):
+    """Routes MCP messages to the callbacks subscribed under the receiver's name.
+
+    By default ``send`` runs the receiver's callbacks synchronously on the
+    caller's thread. With ``async_mode=True`` every agent instead gets a bounded
+    inbox drained by its own worker threads: ``send`` only enqueues, so agents
+    run concurrently and a query can overlap with uploads. The inbox size gives
+    backpressure (``send`` blocks while the receiver's inbox is full and raises
+    ``queue.Full`` after ``send_timeout`` seconds) and the worker count caps how
+    many messages an agent handles at once. Both can be set per agent with
+    ``configure``.
+
+    ``request`` sends a message and returns a ``Future`` that resolves with the
+    first message later sent back to the requester with the same ``trace_id``
+    (wrap it with ``asyncio.wrap_future`` to await it from a coroutine).
+
+    Agents can also live in other processes: ``spawn`` starts worker processes
+    that build agents with a factory and link back to this bus, and ``listen``
+    accepts workers started separately (``transport.connect``) on a local Unix
+    socket. Messages for those agents are encoded with ``messageCodec`` and
+    sent down the link; everything they send comes back through this bus, so
+    ``subscribe``, ``send`` and ``request`` work unchanged. A pool of processes
+    for one agent gets every message of a trace in the same process.
+    ``join`` only waits for the inboxes of this process.
+
+    ``monitor`` registers callbacks that see every message sent through the
+    bus before it is delivered (e.g. to keep a log of the traffic).
+
+    With ``tracing=True`` the bus counts the messages each agent handles and
+    records a span per handler (and per inbox wait) under the message's
+    ``trace_id`` in ``bus.tracer``; code running inside a handler adds its
+    own stages with ``tracing.span``. Spans from worker processes are sent
+    back to this bus's tracer.
+    """
+
+    def __init__(self, async_mode: bool = False, workers: int = 1, max_queue: int = 64,
+                 send_timeout: Optional[float] = 30.0, tracing: bool = False):
         self.subscribers: Dict[str, List[Callable]] = {}
+        self.monitors: List[Callable] = []
         self.lock = Lock()
+        self.async_mode = async_mode
+        self.default_workers = workers
+        self.default_max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.limits: Dict[str, Dict[str, int]] = {}
+        self.inboxes: Dict[str, _Inbox] = {}
+        # (requester, trace_id) -> (future waiting for the reply, expected reply type)
+        self.pending: Dict[Tuple[str, str], Tuple[Future, Optional[str]]] = {}
+        self.remotes: Dict[str, List[Link]] = {}  # agent name -> links to the processes hosting it
+        self.links: List[Link] = []
+        self.uplink: Optional[Link] = None  # set in a worker process: the link to the hub bus
+        # (remote sender, trace_id) -> the link it came from, most recent last
+        self.origins: "OrderedDict[Tuple[str, str], Link]" = OrderedDict()
+        self.listener: Optional[Listener] = None
+        self.closing = False
+        self.tracer = Tracer(enabled=tracing)
+
+    def configure(self, agent_name: str, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        """Set the worker count and inbox size of one agent (async mode, before it subscribes)."""
+        with self.lock:
+            if agent_name in self.inboxes:
+                raise RuntimeError(f"{agent_name} is already running; configure it before subscribing")
+            limits = self.limits.setdefault(agent_name, {})
+            if workers is not None:
+                limits["workers"] = workers
+            if max_queue is not None:
+                limits["max_queue"] = max_queue
 
     def subscribe(self, agent_name: str, callback: Callable):
         with self.lock:
             if agent_name not in self.subscribers:
                 self.subscribers[agent_name] = []
             self.subscribers[agent_name].append(callback)
+            if self.async_mode and agent_name not in self.inboxes:
+                limits = self.limits.get(agent_name, {})
+                self.inboxes[agent_name] = _Inbox(agent_name, self,
+                                                  limits.get("workers", self.default_workers),
+                                                  limits.get("max_queue", self.default_max_queue))
+
+    def unsubscribe(self, agent_name: str, callback: Callable):
+        """Remove `callback`; once `agent_name` has none left, its inbox workers stop."""
+        with self.lock:
+            callbacks = self.subscribers.get(agent_name, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if callbacks:
+                return
+            self.subscribers.pop(agent_name, None)
+            inbox = self.inboxes.pop(agent_name, None)
+        if inbox is not None:
+            for _ in inbox.threads:  # not joined: this may run on one of them
+                inbox.queue.put(None)
+
+    def monitor(self, callback: Callable):
+        """Call `callback(message)` for every message sent through this bus."""
+        with self.lock:
+            self.monitors = self.monitors + [callback]
+
+    def unmonitor(self, callback: Callable):
+        with self.lock:
+            self.monitors = [m for m in self.monitors if m is not callback]
+
+    def spawn(self, agent_name: str, factory: AgentFactory, *args, processes: int = 1, **kwargs) -> List[Link]:
+        """Run `agent_name` in `processes` new processes instead of this one.
+
+        Each process gets its own bus (async, with this bus's limits) and calls
+        ``factory(bus, *args, **kwargs)``, which must subscribe `agent_name`
+        (e.g. pass the agent class). `factory` and its arguments are pickled,
+        so they must be importable at module level. Messages sent before a
+        process is up wait in its pipe.
+        """
+        # spawn, not fork: this process runs threads (inbox workers, torch) that fork would copy mid-flight
+        context = multiprocessing.get_context("spawn")
+        limits = self.limits.get(agent_name, {})
+        options = {"send_timeout": self.send_timeout, "tracing": self.tracer.enabled,
+                   "workers": limits.get("workers", self.default_workers),
+                   "max_queue": limits.get("max_queue", self.default_max_queue)}
+        started = []
+        for n in range(processes):
+            conn, child = context.Pipe()
+            # not a daemon: agents may start process pools of their own (BatchParser)
+            process = context.Process(target=runWorker, args=(child, factory, args, kwargs, options),
+                                      name=f"{agent_name}-process-{n}")
+            process.start()
+            child.close()
+            link = Link(conn, self, process=process)
+            self._attach(link, [agent_name])
+            link.start()
+            started.append(link)
+        return started
+
+    def listen(self, address: str):
+        """Accept workers (``transport.connect``) on the Unix socket `address`."""
+        self.listener = Listener(address, family="AF_UNIX")
+        Thread(target=self._accept, name="MessageBus-listener", daemon=True).start()
+
+    def request(self, message: dict, timeout: Optional[float] = None,
+                reply_type: Optional[str] = None) -> Future:
+        """Send `message` and return a future for the reply to its sender and trace_id.
+
+        With `reply_type` only a message of that type counts as the reply, so
+        intermediate messages on the same trace (e.g. progress updates) pass
+        through to the sender's subscribers without resolving it. The future fails with ``TimeoutError`` after `timeout` seconds, or with the
+        handler's exception if an agent raises while working on this trace.
+        """
+        key = (message["sender"], message["trace_id"])
+        future: Future = Future()
+        with self.lock:
+            if key in self.pending:
+                raise ValueError(f"A request for trace {key[1]} from {key[0]} is already pending")
+            self.pending[key] = (future, reply_type)
+        if timeout is not None:
+            timer = Timer(timeout, self._expire, args=(key, future, timeout))
+            timer.daemon = True
+            timer.start()
+            future.add_done_callback(lambda _: timer.cancel())
+        try:
+            self.send(message)
+        except BaseException as exc:
+            self._settle(key, exc=exc)
+            raise
+        return future
 
     def send(self, message: dict):
+        for monitor in self.monitors:  # replaced, never mutated, so no lock is needed
+            monitor(message)
         receiver = message.get("receiver")
+        if self.pending:
+            self._settle((receiver, message.get("trace_id")), reply=message)
+        if receiver not in self.subscribers:
+            link = self._route(receiver, message.get("trace_id"))
+            if link is not None:
+                link.send(message)
+                return
+        self._deliver(receiver, message)
+
+    def join(self):
+        """Block until every inbox is empty and no message is being handled (async mode)."""
+        # handlers enqueue follow-up messages, so keep going until a full pass finds nothing
+        while True:
+            with self.lock:
+                inboxes = list(self.inboxes.values())
+            if all(i.queue.unfinished_tasks == 0 for i in inboxes):
+                return
+            for inbox in inboxes:
+                inbox.queue.join()
+
+    def shutdown(self):
+        """Stop every worker thread once the messages already queued are handled,
+        and close the links to other processes (waiting for spawned ones to exit)."""
+        self._closeLinks()
         with self.lock:
-            callbacks = self.subscribers.get(receiver, [])
+            inboxes = list(self.inboxes.values())
+            self.inboxes = {}
+        for inbox in inboxes:
+            for _ in inbox.threads:
+                inbox.queue.put(None)
+        for inbox in inboxes:
+            for t in inbox.threads:
+                t.join()
+
+    def _settle(self, key: Tuple[str, str], reply: Optional[dict] = None,
+                exc: Optional[BaseException] = None):
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None or (reply is not None and entry[1] not in (None, reply.get("type"))):
+                return
+            future = self.pending.pop(key)[0]
+        if future.done():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(reply)
+
+    def _expire(self, key: Tuple[str, str], future: Future, timeout: float):
+        with self.lock:
+            if self.pending.get(key, (None,))[0] is not future:
+                return  # already answered
+            del self.pending[key]
+        if not future.done():
+            future.set_exception(RequestTimeout(f"No reply for trace {key[1]} within {timeout}s"))
+
+    def fail_trace(self, trace_id: str, exc: BaseException):
+        """Fail the requests waiting on `trace_id`, for a handler that answers
+        several traces at once (only the trace of the message it was called
+        with is failed when it raises)."""
+        self._fail_trace(trace_id, exc)
+
+    def _fail_trace(self, trace_id: str, exc: BaseException, notify: bool = True):
+        with self.lock:
+            keys = [k for k in self.pending if k[1] == trace_id]
+        for key in keys:
+            self._settle(key, exc=exc)
+        if notify and self.uplink is not None:  # the requester may be waiting in the hub
+            self.uplink.fail(trace_id, exc)
+
+    def _route(self, receiver: str, trace_id: Optional[str]) -> Optional[Link]:
+        """The link a message for a non-local `receiver` goes down, if any."""
+        with self.lock:
+            origin = self.origins.get((receiver, trace_id))
+            if origin is not None and not origin.closed:
+                return origin  # a reply to a process of a pool that sent on this trace
+            links = self.remotes.get(receiver)
+            if links:
+                # the same process handles every message of a trace
+                return links[zlib.crc32(str(trace_id).encode("utf-8")) % len(links)]
+        return self.uplink
+
+    def _forward(self, link: Link, message: dict):
+        """A message from a worker: remember where it came from, then route it."""
+        key = (message.get("sender"), message.get("trace_id"))
+        with self.lock:
+            self.origins[key] = link
+            self.origins.move_to_end(key)
+            if len(self.origins) > ORIGINS:
+                self.origins.popitem(last=False)
+        self.send(message)
+
+    def _receive(self, message: dict):
+        """A message from the hub: settle local requests and deliver to local agents only."""
+        receiver = message.get("receiver")
+        if self.pending:
+            self._settle((receiver, message.get("trace_id")), reply=message)
+        self._deliver(receiver, message)
+
+    def _attach(self, link: Link, names: List[str]):
+        with self.lock:
+            if link not in self.links:
+                if not self.links:
+                    # close the links before multiprocessing joins the (non-daemon) workers at exit
+                    atexit.register(self._closeLinks)
+                self.links.append(link)
+            for name in names:
+                if name not in link.names:
+                    link.names.append(name)
+                    self.remotes.setdefault(name, []).append(link)
+
+    def _detach(self, link: Link):
+        with self.lock:
+            for name in link.names:
+                links = self.remotes.get(name, [])
+                if link in links:
+                    links.remove(link)
+                if not links:
+                    self.remotes.pop(name, None)
+        if not self.closing and link is not self.uplink:
+            print(f"MessageBus: lost the process hosting {', '.join(link.names) or 'an agent'}")
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:  # listener closed
+                return
+            Link(conn, self).start()  # registered once its hello arrives
+
+    def _closeLinks(self):
+        self.closing = True
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        with self.lock:
+            links, self.links = self.links, []
+        for link in links:
+            link.close()
+
+    def _deliver(self, receiver: str, message: dict):
+        if not self.async_mode:
+            self._dispatch(receiver, message)
+            return
+        with self.lock:
+            inbox = self.inboxes.get(receiver)
+        if inbox is not None:
+            inbox.queue.put((message, time.perf_counter()), timeout=self.send_timeout)
+
+    def _dispatch(self, receiver: str, message: dict, queued: Optional[float] = None):
+        with self.lock:
+            callbacks = list(self.subscribers.get(receiver, []))
+        if self.tracer.enabled and callbacks:
+            self._traceArrival(receiver, message, queued)
         for cb in callbacks:
-            cb(message)
+            if not self.async_mode:
+                self._call(cb, receiver, message)
+                continue
+            # a failing handler must not kill the worker thread
+            try:
+                self._call(cb, receiver, message)
+            except Exception as exc:
+                print(f"MessageBus: {receiver} failed on {message.get('type')} "
+                      f"(trace {message.get('trace_id')}):")
+                traceback.print_exc()
+                if self.tracer.enabled:
+                    self.tracer.count(f"{receiver}.failed")
+                # nobody is going to reply on this trace any more
+                self._fail_trace(message.get("trace_id"), exc)
+
+    def _call(self, callback: Callable, receiver: str, message: dict):
+        if not self.tracer.enabled:
+            callback(message)
+            return
+        with self.tracer.handling(message.get("trace_id"), receiver, message.get("type")):
+            callback(message)
+
+    def _traceArrival(self, receiver: str, message: dict, queued: Optional[float]):
+        self.tracer.count(f"{receiver}.{message.get('type')}")
+        if queued is not None:
+            waited = time.perf_counter() - queued
+            self.tracer.record({"trace_id": message.get("trace_id"), "agent": receiver, "name": "queue_wait",
+                                "start": time.time() - waited, "seconds": waited})
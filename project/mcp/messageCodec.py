@@ -0,0 +1,101 @@
+# mcp/message_codec.py
+"""Binary encoding of MCP messages for the process transports.
+
+A message is pickled with protocol 5, so numpy arrays (embeddings) are not
+copied into the pickle stream but handed over as out-of-band buffers, and
+long lists of strings (chunk lists) are serialized separately into one blob
+that also travels out of band. The buffers of a small message are appended
+to the frame; once they add up to ``SHM_THRESHOLD`` bytes they are written
+once into a shared-memory segment and only its name crosses the pipe or
+socket, so a large payload never blocks the link it is sent on. The receiver
+copies the buffers out and unlinks the segment.
+"""
+from typing import Any, List, Tuple
+import pickle, struct
+from multiprocessing import shared_memory, resource_tracker
+
+SHM_THRESHOLD = 1 << 20  # out-of-band bytes above which a message goes through shared memory
+PACK_TEXTS = 64           # lists of at least this many strings are packed into one blob
+
+_HEADER = struct.Struct("<BI")  # buffer mode, length of the pickle stream
+_INLINE, _SHARED = 0, 1
+
+
+class _Texts:
+    """A long list of strings, serialized on its own so its bytes can leave the
+    pickle stream as one out-of-band buffer."""
+
+    def __init__(self, texts: List[str]):
+        self.blob = pickle.dumps(texts, protocol=5)
+
+    def __reduce_ex__(self, protocol):
+        return _unpackTexts, (pickle.PickleBuffer(self.blob),)
+
+
+def _unpackTexts(blob) -> List[str]:
+    return pickle.loads(blob)
+
+
+def _pack(value: Any) -> Any:
+    """`value` with every long list of strings replaced by a `_Texts`."""
+    if isinstance(value, dict):
+        return {k: _pack(v) for k, v in value.items()}
+    if isinstance(value, list):
+        if len(value) >= PACK_TEXTS and all(type(v) is str for v in value):
+            return _Texts(value)
+        return [_pack(v) for v in value]
+    return value
+
+
+def encodeMessage(message: dict) -> bytes:
+    buffers: List[pickle.PickleBuffer] = []
+    body = pickle.dumps(_pack(message), protocol=5, buffer_callback=buffers.append)
+    raws = [b.raw() for b in buffers]
+    sizes = [r.nbytes for r in raws]
+    table = struct.pack(f"<I{len(sizes)}Q", len(sizes), *sizes)
+    if sum(sizes) < SHM_THRESHOLD:
+        return b"".join([_HEADER.pack(_INLINE, len(body)), body, table, *raws])
+
+    shm = shared_memory.SharedMemory(create=True, size=sum(sizes))
+    offset = 0
+    for raw in raws:
+        shm.buf[offset:offset + raw.nbytes] = raw
+        offset += raw.nbytes
+    name = shm.name.encode("ascii")
+    shm.close()
+    # the receiver unlinks it; stop this process's tracker from doing so (and warning) at exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return b"".join([_HEADER.pack(_SHARED, len(body)), body, table, struct.pack("<H", len(name)), name])
+
+
+def decodeMessage(frame: bytes) -> dict:
+    mode, bodyLen = _HEADER.unpack_from(frame, 0)
+    pos = _HEADER.size
+    body = memoryview(frame)[pos:pos + bodyLen]
+    pos += bodyLen
+    (count,) = struct.unpack_from("<I", frame, pos)
+    sizes = struct.unpack_from(f"<{count}Q", frame, pos + 4)
+    pos += 4 + 8 * count
+    if mode == _INLINE:
+        buffers, source = _slices(memoryview(frame), pos, sizes), None
+    else:
+        (nameLen,) = struct.unpack_from("<H", frame, pos)
+        name = bytes(frame[pos + 2:pos + 2 + nameLen]).decode("ascii")
+        source = shared_memory.SharedMemory(name=name)
+        # private copies, so the segment can be released right away
+        buffers = [bytearray(b) for b in _slices(source.buf, 0, sizes)]
+    try:
+        return pickle.loads(body, buffers=buffers)
+    finally:
+        if source is not None:
+            del buffers
+            source.close()
+            source.unlink()
+
+
+def _slices(buf: memoryview, pos: int, sizes: Tuple[int, ...]) -> List[memoryview]:
+    out = []
+    for size in sizes:
+        out.append(buf[pos:pos + size])
+        pos += size
+    return out
@@ -4,16 +4,41 @@ class MCPPayload(TypedDict, total=False):
     top_chunks: list[str]
     query: str
     retrieved_context: list[str]
+    context_report: dict
     answer: str
     source_chunks: list[str]
+    chunks: list[str]
+    source: str
+    unchanged: bool
+    doc_path: str
+    doc_paths: list[str]
+    notify: str
+    documents: list[dict]
+    sources: list[str]
+    done: int
+    total: int
+    query_embedding: list[float]
+    store_version: int
+    cached: bool
+    text: str
+    index: int
+    filters: dict
+    tags: list[str]
+    fingerprints: dict
+    forward_to: str
 
 class MCPMessage(TypedDict):
     sender: str
     receiver: str
     type: Literal[
+        "USER_QUERY",
+        "USER_RESPONSE",
         "INGESTION_RESULT",
+        "INGESTION_PROGRESS",
+        "INGESTION_ACK",
         "RETRIEVAL_RESULT",
         "LLM_RESPONSE",
+        "LLM_RESPONSE_CHUNK",
         "QUERY"
     ]
     trace_id: str
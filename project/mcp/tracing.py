@@ -0,0 +1,124 @@
+# mcp/tracing.py
+"""Per-trace latency spans and per-stage histograms for the message bus.
+
+A `Tracer` belongs to a ``MessageBus``. While the bus runs a handler it
+makes that (trace_id, agent) current on the thread, so code further down
+(parsers, stores, the LLM pool) marks a stage with ``with span("embed"):``
+without being handed the trace. Outside a traced handler, or with tracing
+off, ``span`` returns a shared no-op context. Every span is kept under its
+trace (the latest ``TRACES`` traces) and its duration is added to the
+histogram of that agent and stage (the latest ``WINDOW`` durations).
+"""
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+import threading, time
+
+TRACES = 256   # traces kept for the per-trace breakdown
+WINDOW = 1024  # latest durations kept per (agent, stage) for the percentiles
+
+_NOOP = nullcontext()
+_local = threading.local()
+
+
+def span(name: str):
+    """Time the enclosed block as stage `name` of the trace the current thread works on."""
+    current = getattr(_local, "current", None)
+    if current is None:
+        return _NOOP
+    tracer, trace_id, agent = current
+    return tracer.span(trace_id, agent, name)
+
+
+class Tracer:
+    """Thread-safe spans per trace, message counters and latency percentiles.
+
+    ``forward`` (set in worker processes to the link to the hub) gets every
+    span and count too, through its ``span`` and ``count`` methods, so the hub
+    bus adds them to its own tracer.
+    """
+
+    def __init__(self, enabled: bool = False, traces: int = TRACES, window: int = WINDOW):
+        self.enabled = enabled
+        self.maxTraces = traces
+        self.window = window
+        self.lock = threading.Lock()
+        self.traces: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self.durations: Dict[str, deque] = {}
+        self.counters: Dict[str, int] = {}
+        self.forward = None
+
+    # ---------- public ----------
+    @contextmanager
+    def span(self, trace_id: str, agent: str, name: str):
+        start, begin = time.time(), time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record({"trace_id": trace_id, "agent": agent, "name": name,
+                         "start": start, "seconds": time.perf_counter() - begin})
+
+    @contextmanager
+    def handling(self, trace_id: str, agent: str, name: str):
+        """Span `name` that also makes (trace_id, agent) current for nested ``span`` calls."""
+        outer = getattr(_local, "current", None)
+        _local.current = (self, trace_id, agent)
+        try:
+            with self.span(trace_id, agent, name):
+                yield
+        finally:
+            _local.current = outer
+
+    def record(self, span: dict):
+        """Add a finished span (trace_id, agent, name, start, seconds)."""
+        key = f"{span['agent']}.{span['name']}"
+        with self.lock:
+            spans = self.traces.get(span["trace_id"])
+            if spans is None:
+                spans = self.traces[span["trace_id"]] = []
+                if len(self.traces) > self.maxTraces:
+                    self.traces.popitem(last=False)
+            spans.append(span)
+            durations = self.durations.get(key)
+            if durations is None:
+                durations = self.durations[key] = deque(maxlen=self.window)
+            durations.append(span["seconds"])
+        if self.forward is not None:
+            self.forward.span(span)
+
+    def count(self, key: str, n: int = 1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+        if self.forward is not None:
+            self.forward.count(key, n)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Counters, and count / p50 / p95 / p99 seconds per "agent.stage"."""
+        with self.lock:
+            stages = {}
+            for key, values in self.durations.items():
+                ordered = sorted(values)
+                stages[key] = {"count": len(ordered),
+                               **{f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)]
+                                  for p in (50, 95, 99)}}
+            return {"counters": dict(self.counters), "stages": stages}
+
+    def breakdown(self, trace_id: str) -> List[dict]:
+        """The spans of one trace in start order, with ``offset`` seconds since its first span."""
+        with self.lock:
+            spans = sorted(self.traces.get(trace_id, []), key=lambda s: s["start"])
+        if not spans:
+            return []
+        first = spans[0]["start"]
+        return [dict(s, offset=s["start"] - first) for s in spans]
+
+    def recent(self) -> List[str]:
+        """Trace ids with spans, newest first."""
+        with self.lock:
+            return list(reversed(self.traces))
+
+    def clear(self):
+        with self.lock:
+            self.traces.clear()
+            self.durations.clear()
+            self.counters.clear()
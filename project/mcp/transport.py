@@ -0,0 +1,141 @@
+# mcp/transport.py
+"""Links that carry bus messages between processes.
+
+A hub ``MessageBus`` (the one the UI talks to) reaches agents in other
+processes through a `Link` per worker. Workers are started by
+``MessageBus.spawn`` over a multiprocessing pipe, or start on their own and
+``connect`` to a hub that ``listen``s on a local Unix socket. Both ends use
+``multiprocessing.connection`` objects, so the framing is the same:
+
+    b"M" + encoded message   a bus message (see ``messageCodec``)
+    b"H" + JSON names        the agents a worker hosts (its hello)
+    b"F" + JSON              a handler failed on a trace, so the hub fails its requests
+    b"S" + JSON              a tracing span recorded in a worker
+    b"C" + JSON              a tracing counter increment in a worker
+    b""                      close
+"""
+from typing import Callable, List, Optional
+from threading import Lock, Thread
+import json, traceback
+from multiprocessing.connection import Client, Connection
+from project.mcp.messageCodec import encodeMessage, decodeMessage
+
+AgentFactory = Callable[..., object]  # called with (bus, *args, **kwargs) in the worker, subscribes agents
+
+
+class RemoteAgentError(RuntimeError):
+    """An agent in another process raised while handling a trace."""
+
+
+class Link:
+    """One end of a connection between two buses.
+
+    On the hub, messages read from the link are routed like any ``send``. In a
+    worker (``upstream=True``) they are only delivered to local agents, and
+    everything addressed elsewhere is sent up the link.
+    """
+
+    def __init__(self, conn: Connection, bus, upstream: bool = False, process=None):
+        self.conn = conn
+        self.bus = bus
+        self.upstream = upstream
+        self.process = process
+        self.names: List[str] = []
+        self.lock = Lock()  # frames from several threads must not interleave
+        self.closed = False
+        self.reader: Optional[Thread] = None
+
+    # ---------- public ----------
+    def send(self, message: dict):
+        self._write(b"M" + encodeMessage(message))
+
+    def hello(self, names: List[str]):
+        self._write(b"H" + json.dumps(names).encode("utf-8"))
+
+    def fail(self, trace_id: str, exc: BaseException):
+        text = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        self._write(b"F" + json.dumps({"trace_id": trace_id, "error": text}).encode("utf-8"))
+
+    def span(self, span: dict):
+        self._write(b"S" + json.dumps(span).encode("utf-8"))
+
+    def count(self, key: str, n: int):
+        self._write(b"C" + json.dumps([key, n]).encode("utf-8"))
+
+    def start(self):
+        """Read frames on a background thread."""
+        self.reader = Thread(target=self.serve, name="BusLink-reader", daemon=True)
+        self.reader.start()
+
+    def serve(self):
+        """Read frames until the other end closes the link."""
+        while True:
+            try:
+                frame = self.conn.recv_bytes()
+            except (EOFError, OSError):
+                break
+            if not frame:
+                break
+            try:
+                self._handle(frame)
+            except Exception:
+                print("MessageBus: failed to handle a frame from another process:")
+                traceback.print_exc()
+        self.closed = True
+        self.bus._detach(self)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._write(b"")
+            except OSError:
+                pass
+        if self.process is not None:
+            self.process.join()
+        self.conn.close()
+        self.closed = True
+
+    # ---------- private ----------
+    def _write(self, frame: bytes):
+        with self.lock:
+            self.conn.send_bytes(frame)
+
+    def _handle(self, frame: bytes):
+        kind, body = frame[:1], frame[1:]
+        if kind == b"M":
+            message = decodeMessage(body)
+            if self.upstream:
+                self.bus._receive(message)
+            else:
+                self.bus._forward(self, message)
+        elif kind == b"H":
+            self.bus._attach(self, json.loads(body))
+        elif kind == b"F":
+            failure = json.loads(body)
+            self.bus._fail_trace(failure["trace_id"], RemoteAgentError(failure["error"]),
+                                 notify=not self.upstream)
+        elif kind == b"S":
+            self.bus.tracer.record(json.loads(body))
+        elif kind == b"C":
+            self.bus.tracer.count(*json.loads(body))
+
+
+def runWorker(conn: Connection, factory: AgentFactory, args: tuple, kwargs: dict, busOptions: dict):
+    """Body of a worker process: a local bus with the factory's agents, linked to the hub."""
+    from project.mcp.messageBus import MessageBus
+    # always async: a handler waiting for a reply must not block the reader that delivers it
+    bus = MessageBus(**dict(busOptions, async_mode=True))
+    link = Link(conn, bus, upstream=True)
+    bus.uplink = link
+    if bus.tracer.enabled:
+        bus.tracer.forward = link
+    factory(bus, *args, **kwargs)
+    link.hello(list(bus.subscribers))
+    link.serve()  # until the hub closes the link
+    bus.shutdown()
+
+
+def connect(address: str, factory: AgentFactory, *args, **busOptions):
+    """Run the agents built by `factory` in this process, attached to the hub
+    listening on the Unix socket `address`. Blocks until the hub goes away."""
+    runWorker(Client(address, family="AF_UNIX"), factory, args, {}, busOptions)
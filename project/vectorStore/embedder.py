@@ -0,0 +1,126 @@
+# vector_store/embedder.py
+from typing import List, Optional, Sequence
+import os
+import numpy as np
+from project.documentParsers.chunker import estimateTokens
+from project.mcp.tracing import span
+
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+BATCH_TOKENS = 8192       # padded tokens per forward pass
+MAX_BATCH = 256           # texts per forward pass, however short
+MAX_SEQ_TOKENS = 512      # the model truncates longer inputs anyway
+ONNX_DIR = "vectorDB/onnx"  # quantized exports, made once per model
+QUANTIZATION = "avx2"     # onnxruntime dynamic-quantization preset (runs on any x86-64 from ~2013)
+QUERY_PREFIX = "query: "
+PASSAGE_PREFIX = "passage: "
+
+
+def loadModel(modelName: str, backend: str = "torch", threads: Optional[int] = None):
+    """A CPU ``SentenceTransformer`` for `modelName` on the given backend.
+
+    "onnx" runs the exported graph on onnxruntime; "onnx-int8" additionally
+    quantizes the weights to int8 (exported once into ``ONNX_DIR``). `threads`
+    caps the intra-op threads: per session for onnxruntime, process-wide for torch.
+    """
+    from sentence_transformers import SentenceTransformer
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBED_BACKENDS}")
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(modelName, device="cpu")
+
+    modelKwargs = {"provider": "CPUExecutionProvider"}
+    if threads:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        modelKwargs["session_options"] = options
+    if backend == "onnx":
+        return SentenceTransformer(modelName, device="cpu", backend="onnx", model_kwargs=modelKwargs)
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    localDir = os.path.join(ONNX_DIR, modelName.replace("/", "--"))
+    fileName = f"onnx/model_qint8_{QUANTIZATION}.onnx"
+    if not os.path.exists(os.path.join(localDir, fileName)):
+        exported = SentenceTransformer(modelName, device="cpu", backend="onnx")
+        exported.save_pretrained(localDir)
+        export_dynamic_quantized_onnx_model(exported, QUANTIZATION, localDir)
+    return SentenceTransformer(localDir, device="cpu", backend="onnx",
+                               model_kwargs={"file_name": fileName, **modelKwargs})
+
+
+class Embedder:
+    """Turns queries and passages into normalized float32 vectors.
+
+    Texts are sorted by length and cut into batches of at most ``batchTokens``
+    padded tokens (and ``maxBatch`` texts), so short chunks run in large
+    batches and one long chunk does not pad a batch of short ones. e5 models
+    are trained with "query: " / "passage: " prefixes; ``prefixes`` (on by
+    default for e5 models) adds them. The model itself comes from
+    ``resourceRegistry`` the first time it is needed, so stores using the same
+    model, backend and thread count share one copy and creating an embedder
+    loads nothing.
+    """
+
+    def __init__(self, modelName: str = "intfloat/e5-small-v2", backend: str = "torch",
+                 threads: Optional[int] = None, batchTokens: int = BATCH_TOKENS,
+                 maxBatch: int = MAX_BATCH, prefixes: Optional[bool] = None, model=None):
+        self.modelName = modelName
+        self.backend = backend
+        self.threads = threads
+        self.batchTokens = batchTokens
+        self.maxBatch = maxBatch
+        self.prefixes = "e5" in modelName.lower() if prefixes is None else prefixes
+        self._model = model
+
+    @property
+    def model(self):
+        """The ``SentenceTransformer``, loaded (with torch / onnxruntime) on first use."""
+        if self._model is None:
+            from project.vectorStore.resourceRegistry import getModel
+            self._model = getModel(self.modelName, self.backend, self.threads)
+        return self._model
+
+    @property
+    def name(self) -> str:
+        """Identifies the vectors this embedder produces (used as the cache key)."""
+        return f"{self.modelName}|{self.backend}|{'e5' if self.prefixes else 'plain'}"
+
+    # ---------- public ----------
+    def embedQueries(self, texts: Sequence[str]) -> np.ndarray:
+        return self.encode([QUERY_PREFIX + t for t in texts] if self.prefixes else list(texts))
+
+    def embedPassages(self, texts: Sequence[str]) -> np.ndarray:
+        return self.encode([PASSAGE_PREFIX + t for t in texts] if self.prefixes else list(texts))
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Normalized (len(texts), dim) embeddings of `texts` as given."""
+        out: Optional[np.ndarray] = None
+        with span("embed"):
+            for batch in self.batches(texts):
+                vecs = self.model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                         normalize_embeddings=True, convert_to_numpy=True)
+                if out is None:
+                    out = np.empty((len(texts), vecs.shape[1]), dtype="float32")
+                out[batch] = vecs
+        if out is None:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype="float32")
+        return out
+
+    def batches(self, texts: Sequence[str]) -> List[List[int]]:
+        """Positions of `texts`, longest first, grouped so each group fits the token budget."""
+        lengths = [min(estimateTokens(t) + 2, MAX_SEQ_TOKENS) for t in texts]  # + [CLS] / [SEP]
+        order = sorted(range(len(texts)), key=lambda i: -lengths[i])
+        out, batch = [], []
+        for i in order:
+            # the first (longest) text sets the padded length of the whole batch
+            if batch and ((len(batch) + 1) * lengths[batch[0]] > self.batchTokens
+                          or len(batch) >= self.maxBatch):
+                out.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            out.append(batch)
+        return out
@@ -0,0 +1,89 @@
+# vector_store/embedding_cache.py
+from typing import Dict, Sequence
+import os, sqlite3, hashlib, threading
+import numpy as np
+
+CACHE_ENTRIES = 200_000  # ~300 MB of 384-d float32 vectors
+
+
+def textHash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent, size-bounded LRU cache of embeddings keyed by (model, chunk text).
+
+    Entries live in a small SQLite file so they survive restarts; every hit
+    refreshes the entry's access tick and inserts beyond ``maxEntries`` evict
+    the least recently used rows.
+    """
+
+    def __init__(self, path: str, modelName: str, maxEntries: int = CACHE_ENTRIES):
+        self.path = path
+        self.modelName = modelName
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings ("
+                        "key TEXT PRIMARY KEY, vec BLOB NOT NULL, tick INTEGER NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_tick ON embeddings(tick)")
+        row = self.db.execute("SELECT COALESCE(MAX(tick), 0) FROM embeddings").fetchone()
+        self._tick = row[0]
+
+    # ---------- public ----------
+    def get(self, texts: Sequence[str]) -> Dict[int, np.ndarray]:
+        """Return {position in `texts`: vector} for every cached text."""
+        keys = [self._key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):  # stay under SQLite's variable limit
+                part = keys[start:start + 500]
+                rows = self.db.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part)
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32")
+            if found:
+                tick = self._nextTick()
+                self.db.executemany("UPDATE embeddings SET tick = ? WHERE key = ?",
+                                    [(tick, k) for k in found])
+                self.db.commit()
+        hits = {i: found[k] for i, k in enumerate(keys) if k in found}
+        self.hits += len(hits)
+        self.misses += len(keys) - len(hits)
+        return hits
+
+    def put(self, texts: Sequence[str], vecs: np.ndarray):
+        if not len(texts):
+            return
+        with self.lock:
+            tick = self._nextTick()
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings(key, vec, tick) VALUES (?, ?, ?)",
+                [(self._key(t), np.asarray(v, dtype="float32").tobytes(), tick)
+                 for t, v in zip(texts, vecs)])
+            self._evict()
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # ---------- private ----------
+    def _key(self, text: str) -> str:
+        return textHash(self.modelName + "\0" + text)
+
+    def _nextTick(self) -> int:
+        self._tick += 1
+        return self._tick
+
+    def _evict(self):
+        (count,) = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.maxEntries
+        if excess > 0:
+            self.db.execute("DELETE FROM embeddings WHERE key IN "
+                            "(SELECT key FROM embeddings ORDER BY tick LIMIT ?)", (excess,))
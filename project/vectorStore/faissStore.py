@@ -1,54 +1,790 @@
 # vector_store/faiss_store.py
-from typing import List, Dict, Any, Sequence
-import os, json
+from typing import List, Dict, Any, Iterable, Sequence, Optional, Set, Tuple
+import os, re, json, time, threading, functools
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from project.documentParsers.parsers import DocumentParser
+from project.vectorStore.writeAheadLog import WriteAheadLog
+from project.vectorStore.rwLock import RWLock
+from project.vectorStore.embedder import Embedder, BATCH_TOKENS
+from project.vectorStore.metadataIndex import MetadataIndex
+from project.vectorStore.metaStore import MetaStore
+from project.vectorStore.vectorFile import VectorFile
+from project.vectorStore import indexFactory
+from project.vectorStore.embeddingCache import EmbeddingCache, CACHE_ENTRIES, textHash
+from project.vectorStore.resourceRegistry import getSourceRegistry
+from project.mcp.tracing import span
+
+COMPACT_BYTES = 64 * 1024 * 1024  # fold the write-ahead log into a snapshot past ~64 MB
+PROMOTE_AT = 50_000                # chunks before a flat index migrates to `indexType`
+STREAM_BATCH = 256                 # chunks embedded per step by `upsert_stream`
+SUBSET_SCAN = 4096                 # filtered searches over at most this many chunks are scored exactly
+
+
+def _opened(method):
+    """Open a ``lazy`` store (load the index, replay the log) before `method` runs."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self._isOpen:
+            self._open()
+        return method(self, *args, **kwargs)
+    return wrapper
+
 
 class FaissStore:
+    """FAISS index persisted as snapshot files plus a write-ahead log, with chunk
+    metadata in SQLite.
+
+    Layout inside the index directory (generation ``g`` is named in manifest.json):
+        index.<g>.faiss   index snapshot, written once per compaction
+        wal.<n>.log       writes made after the snapshot (n >= g)
+        meta.sqlite       chunk text and metadata (see ``MetaStore``)
+        vectors.f32       exact vectors behind a lossy index (see ``VectorFile``)
+        sources.json      fingerprints of the indexed files (see ``SourceRegistry``)
+    A write appends the new vectors and metadata to the current log segment,
+    then updates the index and the metadata table. Compaction rotates the log,
+    writes a new snapshot in the background and swaps it in by atomically
+    replacing the manifest, so a crash at any point leaves either the old or the
+    new snapshot plus every log segment it needs. Chunk text is never held in
+    memory: searches read only the rows of their hits.
+
+    Every store starts as an exact ``IndexFlatIP``. When ``indexType`` names an
+    approximate family ("ivf_flat", "ivf_pq" or "hnsw") the store migrates to it
+    in the background once it holds ``promoteAt`` chunks: the new index is
+    trained and filled from the flat vectors, then swapped in and snapshotted.
+
+    ``storage`` compresses the vectors inside the index ("fp16" and "int8"
+    scalar quantization, "pq" product codes); with any lossy encoding the exact
+    float32 vectors are also appended to ``vectors.f32``, and ``rerank`` > 0
+    re-scores that many top candidates of every search against them. With
+    ``mmap=True`` the index snapshot is memory-mapped instead of read into RAM:
+    startup is near-instant and pages load as searches touch them. A mapped
+    index is read-only, so the first write loads a private copy and the next
+    compaction maps the new snapshot again.
+
+    Texts are embedded by an ``Embedder`` (torch or ONNX, optionally int8,
+    with length-sorted token-budgeted batches); pass ``embedder`` to plug in
+    another one. Whether passages were embedded with the e5 "passage: " prefix
+    is recorded with the data, so queries of older unprefixed stores stay
+    unprefixed too.
+
+    Chunk embeddings go through a persistent cache keyed by model and text, and
+    a chunk whose text is already stored for the same source is skipped, so
+    re-uploading a document costs neither embedding time nor duplicate hits.
+
+    Every chunk gets a stable integer id used as its FAISS id, which is what
+    makes ``remove_source`` and ``upsert`` possible without a full rebuild.
+    Chunks also record their upload time and optional tags; ``search`` can be
+    restricted by source, file type, tags and upload time through an inverted
+    index over that metadata (see ``MetadataIndex``).
+
+    The store is safe to share between threads: searches hold a read lock and
+    run concurrently, writes hold the write lock and are applied one at a
+    time. The embedding model comes from ``resourceRegistry`` so every store
+    in the process uses the same copy, and is loaded on the first embedding.
+    With ``lazy=True`` the snapshot and log are also only read by the first
+    call that needs them, so creating the store is cheap; ``warmUp`` does
+    both ahead of time.
+    """
+
     def __init__(self,
                  dim: int = 384,
                  indexPath: str = "vectorDB/index.faiss",
                  metaPath: str  = "vectorDB/meta.json",
-                 modelName: str = "intfloat/e5-small-v2"):
+                 modelName: str = "intfloat/e5-small-v2",
+                 compactBytes: int = COMPACT_BYTES,
+                 indexType: str = "flat",
+                 promoteAt: int = PROMOTE_AT,
+                 nlist: Optional[int] = None,
+                 pqM: int = 16,
+                 hnswM: int = 32,
+                 nprobe: int = 16,
+                 efSearch: int = 64,
+                 cachePath: Optional[str] = "vectorDB/embeddings.sqlite",
+                 cacheEntries: int = CACHE_ENTRIES,
+                 embedBatchSize: int = 256,
+                 embedBackend: str = "torch",
+                 embedThreads: Optional[int] = None,
+                 embedBatchTokens: int = BATCH_TOKENS,
+                 embedder: Optional[Embedder] = None,
+                 storage: str = "float32",
+                 rerank: int = 0,
+                 mmap: bool = False,
+                 lazy: bool = False):
+        if indexType not in indexFactory.INDEX_TYPES:
+            raise ValueError(f"Unknown index type {indexType!r}, expected one of {indexFactory.INDEX_TYPES}")
+        if storage not in indexFactory.STORAGE_TYPES:
+            raise ValueError(f"Unknown storage {storage!r}, expected one of {indexFactory.STORAGE_TYPES}")
         self.dim = dim
         self.indexPath = indexPath
         self.metaPath = metaPath
-        self.model = SentenceTransformer(modelName,device="cpu")
+        self.rootDir = os.path.dirname(indexPath) or "."
+        self.manifestPath = os.path.join(self.rootDir, "manifest.json")
+        self.sourcesPath = os.path.join(self.rootDir, "sources.json")
+        self.compactBytes = compactBytes
+        self.indexType = indexType
+        self.storage = storage
+        self.promoteAt = max(promoteAt, indexFactory.minTrain(indexType, storage))
+        self.rerank = rerank
+        self.mmap = mmap
+        self.nlist = nlist
+        self.pqM = pqM
+        self.hnswM = hnswM
+        self.nprobe = nprobe
+        self.efSearch = efSearch
+        self.modelName = modelName
+        self.embedder = embedder or Embedder(modelName, embedBackend, embedThreads,
+                                             batchTokens=embedBatchTokens, maxBatch=embedBatchSize)
+        self.cache = None
         self.index = None
-        self.meta: List[Dict[str, Any]] = []
-        self._loadIfExists()
+        self.metaStore = MetaStore(os.path.join(self.rootDir, "meta.sqlite"))
+        self.metaIndex = MetadataIndex()  # source / file type / tag / upload time -> ids
+        self.deleted = set()  # ids removed from the metadata but still inside an HNSW graph
+        self._removedWhilePromoting: Optional[Set[int]] = None
+        self.vectorFile = (VectorFile(os.path.join(self.rootDir, "vectors.f32"), dim)
+                           if indexFactory.isLossy(indexType, storage) else None)
+        self._mapped: Optional[str] = None  # snapshot file the index is memory-mapped from
+        self.nextId = 0
+        self.version = 0  # bumped by every write, so caches of search results can tell they are stale
+        self.lock = RWLock()
+        self.walGen = 0
+        self.wal: Optional[WriteAheadLog] = None
+        self._compactor: Optional[threading.Thread] = None
+        self._promoter: Optional[threading.Thread] = None
+        self._promoteError: Optional[Exception] = None
+        self._cacheOptions = (cachePath, cacheEntries)
+        self._isOpen = False
+        self._openLock = threading.Lock()
+        if not lazy:
+            self._open()
 
     # ---------- public ----------
-    def add(self, chunks: Sequence[str], source: str):
-        vecs = self._embed(chunks)
-        if self.index is None:
-            self.index = faiss.IndexFlatIP(self.dim)
-        self.index.add(vecs)
-        self.meta.extend([{"text": c, "source": source} for c in chunks])
-        self._persist()
+    @_opened
+    def add(self, chunks: Sequence[str], source: str, tags: Optional[Sequence[str]] = None) -> int:
+        """Embed and store the chunks not yet stored for `source`; returns how many were new.
+
+        `tags` are attached to the chunks added by this call and can be used as
+        a search filter.
+        """
+        return self._write([(source, chunks)], replace=False, tags={source: tags} if tags else None)[0]
+
+    @_opened
+    def upsert(self, source: str, chunks: Sequence[str], tags: Optional[Sequence[str]] = None) -> int:
+        """Make `chunks` the full content of `source`.
+
+        Chunks whose text is unchanged keep their ids and vectors, chunks that
+        disappeared are removed and only the new ones are embedded (and get
+        `tags`). Returns the number of chunks added.
+        """
+        return self._write([(source, chunks)], replace=True, tags={source: tags} if tags else None)[0]
+
+    @_opened
+    def upsert_many(self, docs: Sequence[Tuple[str, Sequence[str]]],
+                    tags: Optional[Dict[str, Sequence[str]]] = None) -> int:
+        """`upsert` for several (source, chunks) pairs, embedding all new chunks in one go.
+        `tags` maps a source to the tags of its new chunks."""
+        return self._write(docs, replace=True, tags=tags)[0]
+
+    @_opened
+    def upsert_stream(self, source: str, chunks: Iterable[str], batchSize: int = STREAM_BATCH,
+                      tags: Optional[Sequence[str]] = None) -> int:
+        """`upsert` for a chunk iterator of any length.
+
+        Chunks are embedded and stored `batchSize` at a time, so only one batch
+        (plus a hash per chunk) is held in memory; chunks of the previous
+        version that did not reappear are removed at the end.
+        """
+        keep, added, batch = set(), 0, []
+        for c in chunks:
+            batch.append(c)
+            if len(batch) >= batchSize:
+                keep.update(textHash(t) for t in batch)
+                added += self.add(batch, source, tags)
+                batch = []
+        keep.update(textHash(t) for t in batch)
+        added += self.add(batch, source, tags)
+        self.prune(source, keep)
+        return added
+
+    @_opened
+    def prune(self, source: str, keep: Set[str]) -> int:
+        """Remove the chunks of `source` whose text hash is not in `keep`; returns how many."""
+        with self.lock.write():
+            remove = [i for h, i in self.metaStore.hashes(source).items() if h not in keep]
+            if remove:
+                self._commit(remove, [], [], np.empty((0, self.dim), "float32"))
+        self._maintain()
+        return len(remove)
+
+    @_opened
+    def remove_source(self, source: str) -> int:
+        """Drop every chunk of `source`; returns how many were removed."""
+        removed = self._write([(source, [])], replace=True)[1]
+        getSourceRegistry(self.sourcesPath).forget(source)  # so uploading it again indexes it
+        return removed
+
+    def sources(self) -> List[str]:
+        """Every source with chunks in the store. Read from the metadata table,
+        so a lazy store answers without loading its index or replaying its log."""
+        if self.metaStore.needsImport:
+            self._open()  # rows of a pre-SQLite store are still in its meta.json
+        return self.metaStore.sources()
+
+    @_opened
+    def usesPrefixes(self) -> bool:
+        """Whether passages (and so queries) are embedded with the e5 prefixes."""
+        return self.embedder.prefixes
+
+    @_opened
+    def embedQuery(self, query: str) -> np.ndarray:
+        """The normalized (1, dim) embedding `search` uses for `query`."""
+        return self.embedQueries([query])
+
+    @_opened
+    def embedQueries(self, queries: Sequence[str]) -> np.ndarray:
+        """`embedQuery` for several queries, encoded as one batch."""
+        return self.embedder.embedQueries(queries)
+
+    @_opened
+    def search(self, query: str, k: int = 5, queryVector: Optional[np.ndarray] = None,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """The `k` chunks closest to `query` (or to `queryVector` from `embedQuery`, if given),
+        best first, each with its similarity ``score``.
+
+        `filters` restricts the search to matching chunks, e.g.
+        ``{"source": ["a.pdf", "b.pdf"], "filetype": "pdf", "tags": "finance",
+        "added_after": 1719000000}``; see ``MetadataIndex.select``.
+        """
+        vecs = None if queryVector is None else queryVector.reshape(1, -1)
+        return self.search_batch([query], k, queryVectors=vecs, filters=filters)[0]
+
+    @_opened
+    def search_batch(self, queries: Sequence[str], k: int = 5, queryVectors: Optional[np.ndarray] = None,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """`search` for several queries at once: one encode call and one FAISS
+        search over the whole (n, dim) query matrix. Returns one result list per query."""
+        if not len(queries):
+            return []
+        if k <= 0:  # faiss asserts k > 0
+            return [[] for _ in queries]
+        vecs = self.embedQueries(queries) if queryVectors is None else queryVectors
+        with span("search"), self.lock.read():
+            if self.index is None or self.index.ntotal == 0:
+                return [[] for _ in queries]
+            if filters:
+                return self._filteredSearch(vecs, k, filters)
+            # tombstoned HNSW entries can still come back; over-fetch to cover them
+            D, I = self.index.search(vecs, min(self._fetch(k) + len(self.deleted), self.index.ntotal))
+            return self._rows(*self._rerank(vecs, D, I), k)
+
+    @_opened
+    def vectors(self, ids: Sequence[int]) -> np.ndarray:
+        """Normalized vectors of stored chunks, read back from the index when it
+        keeps them exactly and re-embedded (through the cache) otherwise. Ids
+        removed in the meantime get a zero vector."""
+        out = np.zeros((len(ids), self.dim), dtype="float32")
+        if self.vectorFile is not None:
+            live = self.metaStore.get(ids)
+            found = [n for n, i in enumerate(ids) if i in live]
+            if found:
+                out[found] = self.vectorFile.read([ids[n] for n in found])
+            return out
+        with self.lock.read():
+            if isinstance(self.index, faiss.IndexIDMap2):
+                for n, i in enumerate(ids):
+                    if i in self.deleted:
+                        continue
+                    try:
+                        out[n] = self.index.reconstruct(int(i))
+                    except RuntimeError:
+                        pass  # removed from the index since it was found
+                return out
+        rows = self.metaStore.get(ids)
+        live = [n for n, i in enumerate(ids) if i in rows]
+        if live:
+            out[live] = self._embedPassages([rows[ids[n]]["text"] for n in live])
+        return out
+
+    @_opened
+    def tune(self, nprobe: Optional[int] = None, efSearch: Optional[int] = None):
+        """Change the recall/latency trade-off of an IVF (nprobe) or HNSW (efSearch) index."""
+        with self.lock.write():
+            self.nprobe = nprobe or self.nprobe
+            self.efSearch = efSearch or self.efSearch
+            if self.index is not None:
+                self._tuneIndex(self.index)
+
+    @_opened
+    def promote(self, wait: bool = True):
+        """Rebuild the index in the background and swap it in.
+
+        A flat index migrates to ``indexType`` (train, fill, swap, snapshot); an
+        HNSW index is rebuilt without its tombstoned entries. Training and
+        filling run off the lock on a copy of the stored vectors, so searches and
+        writes continue meanwhile and are reconciled just before the swap. A
+        flat index holding fewer vectors than ``indexType`` needs for training
+        raises ``ValueError``; with `wait` a failed rebuild re-raises its error.
+        """
+        with self.lock.write():
+            if self._promoter is not None and self._promoter.is_alive():
+                worker = self._promoter
+            elif not self._shouldPromote(force=True):
+                return
+            else:
+                needed = indexFactory.minTrain(self.indexType, self.storage)
+                if indexFactory.isFlat(self.index) and self.index.ntotal < needed:
+                    raise ValueError(f"{self.indexType}/{self.storage} needs at least {needed} vectors "
+                                     f"to train, the store holds {self.index.ntotal}")
+                self._promoteError = None
+                worker = threading.Thread(target=self._promote, name="FaissStorePromoter", daemon=True)
+                self._promoter = worker
+                worker.start()
+        if wait:
+            worker.join()
+            if self._promoteError is not None:
+                raise self._promoteError
+
+    @_opened
+    def compact(self, wait: bool = True):
+        """Fold the write-ahead log into a fresh snapshot.
+
+        The log is rotated and the in-memory state captured under the lock;
+        the (slow) snapshot write happens on a background thread so writes keep
+        flowing into the new log segment meanwhile.
+        """
+        with self.lock.write():
+            if self._compactor is not None and self._compactor.is_alive():
+                worker = self._compactor
+            else:
+                gen = self.walGen + 1
+                self.wal.close()
+                self.walGen = gen
+                self.wal = WriteAheadLog(self._walPath(gen))
+                blob = faiss.serialize_index(self.index) if self.index is not None else None
+                worker = threading.Thread(target=self._writeSnapshot, args=(gen, blob, self.nextId, self.index),
+                                          name="FaissStoreCompactor", daemon=True)
+                self._compactor = worker
+                worker.start()
+        if wait:
+            worker.join()
+
+    def warmUp(self):
+        """Open the store and run one query through the embedding model, so the
+        first real search pays for neither."""
+        self.embedQueries(["warm-up"])
 
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        vec = self._embed([query])
-        D, I = self.index.search(vec, k)
-        return [self.meta[i] for i in I[0]]
+    def close(self):
+        if self._promoter is not None:
+            self._promoter.join()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self.lock.write():
+            if self.wal is not None:
+                self.wal.close()
+        self.metaStore.close()
+        if self.vectorFile is not None:
+            self.vectorFile.close()
+        if self.cache is not None:
+            self.cache.close()
 
     # ---------- private ----------
-    def _embed(self, texts: Sequence[str]) -> np.ndarray:
-        return self.model.encode(texts, normalize_embeddings=True).astype("float32")
+    def _open(self):
+        with self._openLock:
+            if self._isOpen:
+                return
+            self._loadIfExists()
+            self._checkPrefixes()
+            cachePath, cacheEntries = self._cacheOptions
+            self.cache = EmbeddingCache(cachePath, self.embedder.name, cacheEntries) if cachePath else None
+            if self.index is not None:
+                self._tuneIndex(self.index)
+            self._isOpen = True
+        if self.mmap and self.index is not None and self._mapped is None:
+            self.compact(wait=False)  # replayed log records: snapshot them so the index can be mapped
+        if self._shouldPromote():
+            self.promote(wait=False)
+
+    def _checkPrefixes(self):
+        """Embed queries the way this store's passages were embedded."""
+        recorded = self.metaStore.setting("prefixes")
+        if self.metaStore.count() == 0:
+            recorded = "1" if self.embedder.prefixes else "0"
+        elif recorded is None:
+            recorded = "0"  # chunks stored before passages were prefixed
+        self.metaStore.setSetting("prefixes", recorded)
+        self.embedder.prefixes = recorded == "1"
+
+    def _embedPassages(self, texts: List[str]) -> np.ndarray:
+        if self.cache is None:
+            return self.embedder.embedPassages(texts)
+        cached = self.cache.get(texts)
+        vecs = np.empty((len(texts), self.dim), dtype="float32")
+        for i, v in cached.items():
+            vecs[i] = v
+        missing = [i for i in range(len(texts)) if i not in cached]
+        if missing:
+            fresh = self.embedder.embedPassages([texts[i] for i in missing])
+            vecs[missing] = fresh
+            self.cache.put([texts[i] for i in missing], fresh)
+        return vecs
+
+    def _write(self, docs: Sequence[Tuple[str, Sequence[str]]], replace: bool,
+               tags: Optional[Dict[str, Sequence[str]]] = None) -> Tuple[int, int]:
+        """Add the unseen chunks of every (source, chunks) pair (and with `replace`,
+        drop the chunks no longer listed) as one log record; returns (added, removed).
+
+        All new chunks of the batch are embedded together, in length-sorted
+        batches of at most `embedBatchTokens` tokens, outside the lock."""
+        wanted: Dict[str, Dict[str, str]] = {}  # source -> text hash -> text, first occurrence wins
+        for source, chunks in docs:
+            perSource = wanted.setdefault(source, {})
+            for c in chunks:
+                perSource.setdefault(textHash(c), c)
+        with self.lock.read():
+            stored = {source: self.metaStore.hashes(source) for source in wanted}
+        todo = [(source, h, t) for source, perSource in wanted.items()
+                for h, t in perSource.items() if h not in stored[source]]
+        stale = replace and any(h not in wanted[source] for source in wanted for h in stored[source])
+        if not todo and not stale:
+            return 0, 0
+        vecs = self._embedPassages([t for _, _, t in todo]) if todo else np.empty((0, self.dim), "float32")
+
+        with self.lock.write():
+            # re-check against the current state: another writer may have run meanwhile
+            stored = {source: self.metaStore.hashes(source) for source in wanted}
+            remove = [i for source in wanted if replace
+                      for h, i in stored[source].items() if h not in wanted[source]]
+            keep = [n for n, (source, h, _) in enumerate(todo) if h not in stored[source]]
+            if not keep and not remove:
+                return 0, 0
+            ids = list(range(self.nextId, self.nextId + len(keep)))
+            now = time.time()
+            meta = [{"id": i, "text": todo[n][2], "source": todo[n][0], "hash": todo[n][1], "added_at": now}
+                    for i, n in zip(ids, keep)]
+            for m in meta:
+                if tags and tags.get(m["source"]):
+                    m["tags"] = list(tags[m["source"]])
+            self._commit(remove, ids, meta, vecs[keep])
+        self._maintain()
+        return len(ids), len(remove)
+
+    def _commit(self, remove: List[int], ids: List[int], meta: List[Dict[str, Any]], vecs: np.ndarray):
+        """Log one update record and apply it; call with the lock held."""
+        self.wal.append({"op": "update", "remove": remove, "ids": ids, "meta": meta}, vecs)
+        self._apply(remove, ids, meta, vecs)
+        self.version += 1
+
+    def _maintain(self):
+        """Start a background promotion or compaction if the last write calls for one."""
+        with self.lock.read():
+            needsCompaction = self.wal.size() >= self.compactBytes
+            needsPromotion = self._shouldPromote()
+        if needsPromotion:
+            self.promote(wait=False)
+        elif needsCompaction:
+            self.compact(wait=False)
+
+    def _apply(self, remove: List[int], ids: List[int], meta: List[Dict[str, Any]], vecs: np.ndarray):
+        """Apply one update record to the metadata table, the metadata index and the FAISS index."""
+        for m in meta:
+            m.setdefault("hash", textHash(m["text"]))
+        for m in self.metaStore.apply(remove, meta):
+            self.metaIndex.remove(m)
+        self._ownIndex()
+        if self.index is not None:
+            # every id, not just the rows found: a replayed removal may already be in SQLite
+            self._removeFromIndex(list(remove))
+        if not ids:
+            return
+        if self.index is None:
+            self.index = indexFactory.buildIndex("flat", self.dim, 0)
+        self.index.add_with_ids(vecs, np.asarray(ids, dtype="int64"))
+        if self.vectorFile is not None:
+            self.vectorFile.write(ids, vecs)
+        for m in meta:
+            self.metaIndex.add(m)
+        self.nextId = max(self.nextId, ids[-1] + 1)
+
+    def _rows(self, D: np.ndarray, I: np.ndarray, k: int) -> List[List[Dict[str, Any]]]:
+        """Metadata of the first `k` live ids of every row of a FAISS result,
+        each with its inner-product ``score``."""
+        hits = [[(int(i), float(d)) for d, i in zip(dRow, iRow) if i >= 0 and int(i) not in self.deleted]
+                for dRow, iRow in zip(D, I)]
+        rows = self.metaStore.get(sorted({i for row in hits for i, _ in row}))
+        return [[dict(rows[i], score=d) for i, d in row if i in rows][:k] for row in hits]
+
+    def _filteredSearch(self, vecs: np.ndarray, k: int, filters: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """Top-k among the chunks matching `filters`; call with the lock held.
+
+        Small candidate sets are scored exactly against their stored vectors.
+        Larger ones are searched through the index with a FAISS id selector,
+        visiting proportionally more IVF cells / HNSW nodes the more selective
+        the filter is, so the k results are still found. Flat PQ codes cannot
+        take a selector, so those are always scanned exactly (in blocks).
+        """
+        ids, lo, hi = self.metaIndex.select(filters, self.nextId)
+        count = len(ids) if ids is not None else hi - lo
+        if count <= 0 or k <= 0:
+            return [[] for _ in vecs]
+        if count <= SUBSET_SCAN or not indexFactory.supportsSelector(self.index):
+            cand = sorted(ids) if ids is not None else self.metaStore.idsBetween(lo, hi)
+            if not cand:
+                return [[] for _ in vecs]
+            return self._rows(*self._scan(vecs, np.asarray(cand, dtype="int64"), k), k)
+
+        if ids is not None:
+            selector = faiss.IDSelectorBatch(np.fromiter(ids, dtype="int64", count=len(ids)))
+            fetch = min(self._fetch(k), count)
+        else:
+            selector = faiss.IDSelectorRange(lo, hi)
+            fetch = min(self._fetch(k) + len(self.deleted), count)  # the range may include HNSW tombstones
+        params = indexFactory.searchParams(self.index, self.nprobe, self.efSearch, selector,
+                                           fraction=count / self.index.ntotal, k=fetch)
+        D, I = self.index.search(vecs, fetch, params=params)
+        return self._rows(*self._rerank(vecs, D, I), k)
+
+    def _reranking(self) -> bool:
+        return self.rerank > 0 and self.vectorFile is not None and not indexFactory.isFlat(self.index)
+
+    def _fetch(self, k: int) -> int:
+        """Candidates to ask the index for: `rerank` of them when re-ranking."""
+        return max(k, self.rerank) if self._reranking() else k
+
+    def _rerank(self, vecs: np.ndarray, D: np.ndarray, I: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score every row of candidate ids with their exact float32 vectors and reorder it."""
+        if not self._reranking():
+            return D, I
+        cand = np.unique(I[I >= 0])
+        if not len(cand):
+            return D, I
+        scores = vecs @ self.vectorFile.read(cand).T  # (queries, candidates)
+        pos = np.searchsorted(cand, np.maximum(I, 0))
+        exact = np.where(I >= 0, np.take_along_axis(scores, pos, axis=1), -np.inf)
+        order = np.argsort(-exact, axis=1, kind="stable")
+        return np.take_along_axis(exact, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def _scan(self, vecs: np.ndarray, cand: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k (scores, ids) among `cand` for every query, SUBSET_SCAN candidates at a time."""
+        best = np.full((len(vecs), 0), -1, dtype="int64")
+        bestScores = np.zeros((len(vecs), 0), dtype="float32")
+        for start in range(0, len(cand), SUBSET_SCAN):
+            block = cand[start:start + SUBSET_SCAN]
+            scores = np.hstack([bestScores, vecs @ self._exactVectors(self.index, block).T])
+            ids = np.hstack([best, np.broadcast_to(block, (len(vecs), len(block)))])
+            top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+            best, bestScores = np.take_along_axis(ids, top, axis=1), np.take_along_axis(scores, top, axis=1)
+        return bestScores, best
+
+    def _tuneIndex(self, index: faiss.Index):
+        """Apply the query-time knobs to an index about to serve searches."""
+        indexFactory.tuneIndex(index, self.nprobe, self.efSearch)
+        if self.vectorFile is None:
+            indexFactory.mapIds(index)  # exact filtered scans reconstruct IVF vectors by id
+
+    def _exactVectors(self, index: faiss.Index, ids: Sequence[int]) -> np.ndarray:
+        """Vectors of ids stored in `index`, from the float32 copy when the index is lossy."""
+        if self.vectorFile is not None and not indexFactory.isFlat(index):
+            return self.vectorFile.read(ids)
+        return np.vstack([index.reconstruct(int(i)) for i in ids])
+
+    def _ownIndex(self):
+        """Swap a memory-mapped (read-only) index for a private in-memory copy before a write."""
+        if self._mapped is not None:
+            self.index = faiss.read_index(self._mapped)
+            self._tuneIndex(self.index)
+            self._mapped = None
+
+    def _shouldPromote(self, force: bool = False) -> bool:
+        if self.index is None or (self._promoter is not None and self._promoter.is_alive()):
+            return False
+        if indexFactory.isFlat(self.index):
+            compress = self.indexType != "flat" or self.storage != "float32"
+            return compress and (force or self.index.ntotal >= self.promoteAt)
+        # HNSW: rebuild once tombstones make up a fifth of the graph
+        return bool(self.deleted) and (force or len(self.deleted) * 5 >= self.index.ntotal)
+
+    def _promote(self):
+        try:
+            self._rebuild()
+        except Exception as exc:
+            self._promoteError = exc  # for a caller waiting in `promote`
+            raise
+        finally:
+            with self.lock.write():
+                self._removedWhilePromoting = None
+
+    def _rebuild(self):
+        with self.lock.write():
+            old = self.index
+            ids, vecs = indexFactory.storedVectors(old)
+            live = np.fromiter((int(i) not in self.deleted for i in ids), dtype=bool, count=len(ids))
+            firstNew = self.nextId
+            family = self.indexType if indexFactory.isFlat(old) else "hnsw"
+            self._removedWhilePromoting = set()
+        ids, vecs = ids[live], vecs[live]
+        if self.vectorFile is not None:
+            if indexFactory.isFlat(old):
+                self.vectorFile.write(ids, vecs)  # vectors added before the store kept a float32 copy
+            else:
+                vecs = self.vectorFile.read(ids)  # re-encode from the exact vectors, not decoded codes
+        index = indexFactory.buildIndex(family, self.dim, len(ids), nlist=self.nlist, pqM=self.pqM,
+                                        hnswM=self.hnswM, storage=self.storage)
+        indexFactory.trainIndex(index, vecs)
+        index.add_with_ids(vecs, ids)
+        with self.lock.write():
+            # replay what happened while we were building
+            added = [i for i in self.metaStore.idsBetween(firstNew, self.nextId) if i not in self.deleted]
+            if added:
+                index.add_with_ids(self._exactVectors(old, added), np.asarray(added, dtype="int64"))
+            gone = [i for i in self._removedWhilePromoting if i < firstNew]
+            self._removedWhilePromoting = None
+            self.deleted = set()
+            self.index = index
+            self._mapped = None
+            self._removeFromIndex(gone)
+            self._tuneIndex(index)
+        self.compact(wait=False)
+
+    def _removeFromIndex(self, ids: List[int]):
+        if not ids:
+            return
+        if self._removedWhilePromoting is not None:
+            self._removedWhilePromoting.update(ids)
+        if indexFactory.supportsRemove(self.index):
+            self._ownIndex()
+            self.index.remove_ids(np.asarray(ids, dtype="int64"))
+        else:
+            self.deleted.update(ids)
 
     def _loadIfExists(self):
-        if os.path.exists(self.indexPath) and os.path.exists(self.metaPath):
-            self.index = faiss.read_index(self.indexPath)
-            with open(self.metaPath, "r", encoding="utf-8") as f:
-                self.meta = json.load(f)
-
-    def _persist(self):
-        os.makedirs(os.path.dirname(self.indexPath), exist_ok=True)
-        faiss.write_index(self.index, self.indexPath)
-        with open(self.metaPath, "w", encoding="utf-8") as f:
-            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        snapshot, manifest = 0, {}
+        if os.path.exists(self.manifestPath):
+            with open(self.manifestPath, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            snapshot = manifest["snapshot"]
+            indexPath, metaPath = self._snapshotPaths(snapshot)
+        else:
+            # pre-log stores only have the plain index.faiss / meta.json pair
+            indexPath, metaPath = self.indexPath, self.metaPath
+        index = None
+        if os.path.exists(indexPath):
+            if self.mmap and os.path.exists(self.manifestPath):
+                index = faiss.read_index(indexPath, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+                self._mapped = indexPath
+            else:
+                index = faiss.read_index(indexPath)
+        if index is not None and not indexFactory.hasIds(index):
+            self._mapped = None
+            # positional ids from before chunks had stable ids: re-add under the same numbers
+            ids, vecs = indexFactory.storedVectors(index)
+            family = "flat" if indexFactory.isFlat(index) else "hnsw"
+            index = indexFactory.buildIndex(family, self.dim, len(ids), hnswM=self.hnswM)
+            index.add_with_ids(vecs, ids)
+        self.index = index
+        if self.metaStore.needsImport:
+            self._importMetaJson(metaPath)
+
+        # replay every log segment the snapshot does not already contain
+        self.nextId = max(manifest.get("nextId", 0), self.metaStore.maxId() + 1)
+        segments = sorted(g for g in self._walSegments() if g >= snapshot)
+        for gen in segments:
+            for record, vecs in WriteAheadLog.replay(self._walPath(gen), self.dim):
+                # records written before stable ids were positional appends
+                ids = record.get("ids") or list(range(self.nextId, self.nextId + len(record["meta"])))
+                for i, m in zip(ids, record["meta"]):
+                    m.setdefault("id", i)
+                self._apply(record.get("remove", []), ids, record["meta"], vecs)
+        self.walGen = segments[-1] if segments else snapshot
+        self.wal = WriteAheadLog(self._walPath(self.walGen))
+
+        # every row is in the index; extra index entries are removals SQLite already
+        # has but the snapshot does not (or HNSW tombstones)
+        if self.index is not None and self.index.ntotal > self.metaStore.count():
+            stored = self.metaStore.idsBetween(0, self.nextId)
+            if indexFactory.supportsRemove(self.index):
+                self._ownIndex()
+                keep = faiss.IDSelectorBatch(np.asarray(stored, dtype="int64"))
+                self.index.remove_ids(faiss.IDSelectorNot(keep))
+            else:
+                ids, _ = indexFactory.storedVectors(self.index)
+                self.deleted = set(ids.tolist()) - set(stored)
+        self.metaIndex.rebuild(self.metaStore.scan())
+        if self.vectorFile is not None and not self.vectorFile.existed and self.index is not None \
+                and not indexFactory.isFlat(self.index):
+            # a lossy index from before the float32 copy existed: there is nothing exact to read back
+            print(f"FaissStore: {self.rootDir} has no vectors.f32 for its lossy {self.indexType} index; "
+                  f"re-ranking is disabled")
+            self.vectorFile.close()
+            os.remove(self.vectorFile.path)
+            self.vectorFile = None
+
+    def _importMetaJson(self, metaPath: str):
+        """One-off move of a pre-SQLite meta.json snapshot into the metadata table."""
+        if os.path.exists(metaPath):
+            with open(metaPath, "r", encoding="utf-8") as f:
+                metaList = json.load(f)
+            for pos, m in enumerate(metaList):
+                m.setdefault("id", pos)
+                m.setdefault("hash", textHash(m["text"]))
+            self.metaStore.apply([], metaList)
+        self.metaStore.markImported()
+
+    def _writeSnapshot(self, gen: int, blob: Optional[np.ndarray], nextId: int, index: Optional[faiss.Index]):
+        indexPath, _ = self._snapshotPaths(gen)
+        if blob is not None:
+            self._atomicWrite(indexPath, blob.tobytes())
+        # the rows the new snapshot relies on must be on disk before the log segments go
+        self.metaStore.flush()
+        if self.vectorFile is not None:
+            self.vectorFile.flush()
+        self._atomicWrite(self.manifestPath, json.dumps({"snapshot": gen, "nextId": nextId}).encode("utf-8"))
+        if self.mmap and blob is not None:
+            with self.lock.write():
+                # map the snapshot just written unless the index changed since it was captured
+                if self.index is index and self._mapped is None and self.wal.size() == 0:
+                    self.index = faiss.read_index(indexPath, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+                    self._tuneIndex(self.index)
+                    self._mapped = indexPath
+
+        # the manifest now points at `gen`; older snapshots and log segments are garbage
+        for old in self._walSegments():
+            if old < gen:
+                self._removeQuietly(self._walPath(old))
+        for name in os.listdir(self.rootDir):
+            m = re.fullmatch(r"(?:index|meta)\.(\d+)\.(?:faiss|json)", name)
+            if m and int(m.group(1)) < gen:
+                self._removeQuietly(os.path.join(self.rootDir, name))
+        for legacy in (self.indexPath, self.metaPath):
+            self._removeQuietly(legacy)
+
+    def _snapshotPaths(self, gen: int):
+        return (os.path.join(self.rootDir, f"index.{gen}.faiss"),
+                os.path.join(self.rootDir, f"meta.{gen}.json"))
+
+    def _walPath(self, gen: int) -> str:
+        return os.path.join(self.rootDir, f"wal.{gen}.log")
+
+    def _walSegments(self) -> List[int]:
+        if not os.path.isdir(self.rootDir):
+            return []
+        found = (re.fullmatch(r"wal\.(\d+)\.log", n) for n in os.listdir(self.rootDir))
+        return [int(m.group(1)) for m in found if m]
+
+    @staticmethod
+    def _atomicWrite(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _removeQuietly(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
 
 
 
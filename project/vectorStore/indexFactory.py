@@ -0,0 +1,169 @@
+# vector_store/index_factory.py
+from typing import Optional, Tuple
+import math
+import numpy as np
+import faiss
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+STORAGE_TYPES = ("float32", "fp16", "int8", "pq")  # how each vector is encoded inside the index
+
+# smallest corpus worth training on: IVF wants ~39 points per centroid and
+# 8-bit PQ wants the same for each of its 256 codewords
+MIN_TRAIN = {"flat": 0, "ivf_flat": 1024, "ivf_pq": 10_000, "hnsw": 0}
+MIN_TRAIN_STORAGE = {"float32": 0, "fp16": 0, "int8": 1024, "pq": 10_000}
+_SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+MAX_TRAIN = 200_000  # k-means on more points than this buys nothing
+MAX_EF_SEARCH = 4096  # cap on the HNSW search breadth of filtered queries
+MAX_PROBE_SHARE = 0.25  # cap on the share of IVF cells a filtered query visits
+
+
+def buildIndex(indexType: str, dim: int, nTrain: int, nlist: Optional[int] = None,
+               pqM: int = 16, hnswM: int = 32, storage: str = "float32") -> faiss.Index:
+    """Create an empty inner-product index of the requested family.
+
+    Every index accepts caller-chosen ids through ``add_with_ids``: IVF indexes
+    store them natively, flat and HNSW are wrapped in an ``IndexIDMap2`` (which
+    also keeps ``reconstruct`` by id working for rebuilds).
+
+    `storage` picks the vector encoding: full float32, scalar-quantized fp16
+    (2 bytes per dimension) or int8 (1 byte), or product-quantized codes of
+    `pqM` bytes. "ivf_pq" always stores PQ codes.
+    """
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown storage {storage!r}, expected one of {STORAGE_TYPES}")
+    if (storage == "pq" or indexType == "ivf_pq") and dim % pqM:
+        raise ValueError(f"pqM={pqM} must divide the embedding dimension {dim}")
+    ip = faiss.METRIC_INNER_PRODUCT
+    if indexType == "flat":
+        if storage == "float32":
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        if storage == "pq":
+            return faiss.IndexIDMap2(faiss.IndexPQ(dim, pqM, 8, ip))
+        return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, _SQ_TYPES[storage], ip))
+    if indexType == "hnsw":
+        if storage == "float32":
+            return faiss.IndexIDMap2(faiss.IndexHNSWFlat(dim, hnswM, ip))
+        if storage == "pq":
+            return faiss.IndexIDMap2(faiss.IndexHNSWPQ(dim, pqM, hnswM, 8, ip))
+        return faiss.IndexIDMap2(faiss.IndexHNSWSQ(dim, _SQ_TYPES[storage], hnswM, ip))
+    nlist = nlist or suggestNlist(nTrain)
+    quantizer = faiss.IndexFlatIP(dim)
+    if indexType == "ivf_pq" or (indexType == "ivf_flat" and storage == "pq"):
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, pqM, 8, ip)
+    if indexType == "ivf_flat":
+        if storage == "float32":
+            return faiss.IndexIVFFlat(quantizer, dim, nlist, ip)
+        return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, _SQ_TYPES[storage], ip)
+    raise ValueError(f"Unknown index type {indexType!r}, expected one of {INDEX_TYPES}")
+
+
+def minTrain(indexType: str, storage: str) -> int:
+    return max(MIN_TRAIN[indexType], MIN_TRAIN_STORAGE[storage])
+
+
+def isLossy(indexType: str, storage: str) -> bool:
+    """True when the index keeps only an approximation of each vector."""
+    return storage != "float32" or indexType == "ivf_pq"
+
+
+def suggestNlist(n: int) -> int:
+    # the usual 4*sqrt(n) rule, capped so every centroid still gets ~39 training points
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def trainIndex(index: faiss.Index, vecs: np.ndarray, seed: int = 1234):
+    if index.is_trained:
+        return
+    if len(vecs) > MAX_TRAIN:
+        pick = np.random.default_rng(seed).choice(len(vecs), MAX_TRAIN, replace=False)
+        vecs = vecs[np.sort(pick)]
+    index.train(vecs)
+
+
+def tuneIndex(index: faiss.Index, nprobe: int, efSearch: int):
+    """Apply the query-time knobs that exist for this index family."""
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass  # not an IVF index
+    hnsw = getattr(baseIndex(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = efSearch
+
+
+def mapIds(index: faiss.Index):
+    """Let an IVF index ``reconstruct`` vectors by id (a hashtable from id to
+    list slot, kept up to date by later adds and removes); flat and HNSW
+    indexes already can through their ``IndexIDMap2``."""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return  # not an IVF index
+    if ivf.direct_map.type != faiss.DirectMap.Hashtable:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+
+def searchParams(index: faiss.Index, nprobe: int, efSearch: int, selector: faiss.IDSelector,
+                 fraction: float, k: int) -> faiss.SearchParameters:
+    """Search parameters restricting `index` to the ids accepted by `selector`.
+
+    `fraction` is the share of the index the selector accepts. IVF visits
+    ``nprobe / fraction`` cells (at most a ``MAX_PROBE_SHARE`` of them, so a
+    selective filter never turns into a full scan; the store scores small
+    candidate sets exactly instead) and HNSW explores ``efSearch / fraction``
+    candidates (capped), so a selective filter still sees about as many
+    matching vectors as an unfiltered search. The selector must outlive the search.
+    """
+    base = baseIndex(index)
+    scale = 1.0 / max(fraction, 1e-6)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        cap = max(nprobe, int(base.nlist * MAX_PROBE_SHARE))
+        params.nprobe = min(base.nlist, cap, math.ceil(nprobe * scale))
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = max(k, min(MAX_EF_SEARCH, math.ceil(efSearch * scale)))
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+
+def baseIndex(index: faiss.Index) -> faiss.Index:
+    """The index doing the actual search, with any id-map wrapper peeled off."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def isFlat(index: faiss.Index) -> bool:
+    """True for the exact float32 ``IndexFlatIP`` every store starts with."""
+    return isinstance(baseIndex(index), faiss.IndexFlat)
+
+
+def hasIds(index: faiss.Index) -> bool:
+    """False for the positional-id indexes written before chunks had stable ids."""
+    index = faiss.downcast_index(index)
+    return isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF))
+
+
+def supportsRemove(index: faiss.Index) -> bool:
+    # HNSW graphs cannot drop nodes; the store tombstones those ids instead
+    return not isinstance(baseIndex(index), faiss.IndexHNSW)
+
+
+def supportsSelector(index: faiss.Index) -> bool:
+    # flat PQ codes are scanned by kernels that cannot skip ids
+    return not isinstance(baseIndex(index), faiss.IndexPQ)
+
+
+def storedVectors(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """(ids, vectors) of every entry of a flat or HNSW index, for rebuilding it
+    (decoded, so only approximate for quantized storage)."""
+    wrapper = faiss.downcast_index(index)
+    inner = baseIndex(index)
+    vecs = inner.reconstruct_n(0, inner.ntotal)
+    if isinstance(wrapper, faiss.IndexIDMap2):
+        return faiss.vector_to_array(wrapper.id_map).copy(), vecs
+    return np.arange(inner.ntotal, dtype="int64"), vecs
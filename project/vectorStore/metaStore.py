@@ -0,0 +1,124 @@
+# vector_store/meta_store.py
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import os, json, sqlite3, threading
+
+_COLUMNS = "id, source, hash, added_at, tags"
+
+
+class MetaStore:
+    """Chunk metadata (text, source, hash, upload time, tags) in a SQLite table.
+
+    Only the rows a caller asks for are read, so resident memory does not grow
+    with the text of the corpus and opening a store does not parse it. Rows are
+    written in the same order as the vector store's write-ahead log and every
+    write is idempotent (insert-or-replace, delete), so replaying the log after
+    a crash converges on the same rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS chunks ("
+                        "id INTEGER PRIMARY KEY, source TEXT NOT NULL, hash TEXT NOT NULL, "
+                        "text TEXT NOT NULL, added_at REAL NOT NULL DEFAULT 0, tags TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source, hash)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+        # 0 until the rows of a pre-SQLite meta.json have been imported (or found absent)
+        self.needsImport = self.db.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    # ---------- public ----------
+    def markImported(self):
+        with self.lock:
+            self.db.execute("PRAGMA user_version = 1")
+            self.db.commit()
+            self.needsImport = False
+
+    def setting(self, key: str) -> Optional[str]:
+        """A store-wide setting recorded with the data (e.g. how its vectors were made)."""
+        with self.lock:
+            row = self.db.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def setSetting(self, key: str, value: str):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO settings(key, value) VALUES (?, ?)", (key, value))
+            self.db.commit()
+
+    def apply(self, remove: Sequence[int], metas: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Delete the `remove` ids and insert `metas` in one transaction; returns
+        the deleted rows (without text)."""
+        with self.lock:
+            removed = list(self._select(f"SELECT {_COLUMNS} FROM chunks WHERE id IN ", remove))
+            for start in range(0, len(remove), 500):
+                part = list(remove[start:start + 500])
+                self.db.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(part))})", part)
+            self.db.executemany(
+                "INSERT OR REPLACE INTO chunks(id, source, hash, text, added_at, tags) VALUES (?, ?, ?, ?, ?, ?)",
+                [(m["id"], m["source"], m["hash"], m["text"], m.get("added_at", 0.0),
+                  json.dumps(m["tags"]) if m.get("tags") else None) for m in metas])
+            self.db.commit()
+        return removed
+
+    def get(self, ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """{id: metadata with text} for the ids that exist."""
+        with self.lock:
+            rows = self._select(f"SELECT {_COLUMNS}, text FROM chunks WHERE id IN ", ids)
+            return {m["id"]: m for m in rows}
+
+    def hashes(self, source: str) -> Dict[str, int]:
+        """{text hash: id} of every chunk of `source`."""
+        with self.lock:
+            return dict(self.db.execute("SELECT hash, id FROM chunks WHERE source = ?", (source,)))
+
+    def sources(self) -> List[str]:
+        with self.lock:
+            return [s for (s,) in self.db.execute("SELECT DISTINCT source FROM chunks")]
+
+    def idsBetween(self, lo: int, hi: int) -> List[int]:
+        with self.lock:
+            return [i for (i,) in self.db.execute("SELECT id FROM chunks WHERE id >= ? AND id < ? ORDER BY id",
+                                                  (lo, hi))]
+
+    def scan(self) -> Iterator[Dict[str, Any]]:
+        """Every row without its text, in id order (for rebuilding in-memory indexes)."""
+        with self.lock:
+            rows = self.db.execute(f"SELECT {_COLUMNS} FROM chunks ORDER BY id").fetchall()
+        return (self._row(r) for r in rows)
+
+    def maxId(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(MAX(id), -1) FROM chunks").fetchone()[0]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def flush(self):
+        """Make every committed row durable (checkpoint SQLite's own log into the file)."""
+        with self.lock:
+            self.db.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # ---------- private ----------
+    def _select(self, sql: str, ids: Sequence[int]) -> Iterator[Dict[str, Any]]:
+        for start in range(0, len(ids), 500):  # stay under SQLite's variable limit
+            part = [int(i) for i in ids[start:start + 500]]
+            for row in self.db.execute(f"{sql}({','.join('?' * len(part))})", part).fetchall():
+                yield self._row(row)
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        m = {"id": row[0], "source": row[1], "hash": row[2], "added_at": row[3]}
+        if row[4]:
+            m["tags"] = json.loads(row[4])
+        if len(row) > 5:
+            m["text"] = row[5]
+        return m
@@ -0,0 +1,95 @@
+# vector_store/metadata_index.py
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import os
+
+FILTER_FIELDS = ("source", "filetype", "tags", "added_after", "added_before")
+
+
+def fileType(source: str) -> str:
+    return os.path.splitext(source)[1].lower().lstrip(".")
+
+
+class MetadataIndex:
+    """Inverted index from chunk metadata to chunk ids, for filtered search.
+
+    Sources, file types and tags map to the set of ids carrying them. Upload
+    times need no postings: ids are handed out in commit order, so a time
+    range is an id range, found by bisecting the (added_at, first id) pair
+    recorded for every write.
+    """
+
+    def __init__(self):
+        self.postings: Dict[Tuple[str, str], Set[int]] = {}
+        # (added_at, first id) of every write, as two ascending lists
+        self.times: List[float] = []
+        self.firstIds: List[int] = []
+
+    # ---------- public ----------
+    def add(self, meta: Dict[str, Any]):
+        for key in self._keys(meta):
+            self.postings.setdefault(key, set()).add(meta["id"])
+        addedAt = meta.get("added_at", 0.0)
+        if not self.times or (addedAt > self.times[-1] and meta["id"] > self.firstIds[-1]):
+            self.times.append(addedAt)
+            self.firstIds.append(meta["id"])
+
+    def remove(self, meta: Dict[str, Any]):
+        for key in self._keys(meta):
+            ids = self.postings.get(key)
+            if ids is not None:
+                ids.discard(meta["id"])
+                if not ids:
+                    del self.postings[key]
+
+    def rebuild(self, metas: Iterable[Dict[str, Any]]):
+        self.postings, self.times, self.firstIds = {}, [], []
+        for m in sorted(metas, key=lambda m: m["id"]):
+            self.add(m)
+
+    def select(self, filters: Dict[str, Any], nextId: int) -> Tuple[Optional[Set[int]], int, int]:
+        """Resolve `filters` to (ids, lo, hi): the matching ids (None when only
+        the time range applies) and the id range [lo, hi) the upload time allows.
+
+        Values of "source", "filetype" and "tags" may be a string or a list
+        (any of them matches); the fields are combined with AND. "added_after"
+        and "added_before" are epoch seconds.
+        """
+        unknown = set(filters) - set(FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown filter field(s) {sorted(unknown)}, expected {FILTER_FIELDS}")
+        ids: Optional[Set[int]] = None
+        for field, key in (("source", "source"), ("filetype", "filetype"), ("tags", "tag")):
+            values = filters.get(field)
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            if field == "filetype":
+                values = [v.lower().lstrip(".") for v in values]
+            matched: Set[int] = set()
+            for v in values:
+                matched |= self.postings.get((key, v), set())
+            ids = matched if ids is None else ids & matched
+        lo, hi = self._idRange(filters.get("added_after"), filters.get("added_before"), nextId)
+        if ids is not None and (lo > 0 or hi < nextId):
+            ids = {i for i in ids if lo <= i < hi}
+        return ids, lo, hi
+
+    # ---------- private ----------
+    @staticmethod
+    def _keys(meta: Dict[str, Any]):
+        yield ("source", meta["source"])
+        yield ("filetype", fileType(meta["source"]))
+        for tag in meta.get("tags") or ():
+            yield ("tag", tag)
+
+    def _idRange(self, after: Optional[float], before: Optional[float], nextId: int) -> Tuple[int, int]:
+        lo, hi = 0, nextId
+        if after is not None:
+            n = bisect_left(self.times, after)
+            lo = self.firstIds[n] if n < len(self.times) else nextId
+        if before is not None:
+            n = bisect_left(self.times, before)
+            hi = self.firstIds[n] if n < len(self.times) else nextId
+        return lo, max(lo, hi)
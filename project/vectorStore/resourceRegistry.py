@@ -0,0 +1,123 @@
+# vector_store/resource_registry.py
+"""Process-wide instances of the heavy resources.
+
+Streamlit runs every browser session in the same process, and each session
+builds its own agents. Going through this registry gives all of them one copy
+of each embedding model, one ``FaissStore`` (or ``ShardedStore``) per index
+directory, one ``SourceRegistry`` per fingerprint file and one ``BatchParser``
+process pool per chunking setup instead of one per session.
+"""
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+import os, atexit, threading
+from project.vectorStore.embedder import loadModel
+from project.documentParsers.sourceRegistry import SourceRegistry
+if TYPE_CHECKING:  # torch loads with the first model; the stores and parsers import this module
+    from sentence_transformers import SentenceTransformer
+    from project.vectorStore.faissStore import FaissStore
+    from project.vectorStore.shardedStore import ShardedStore
+    from project.documentParsers.batchParser import BatchParser
+    from project.documentParsers.parsers import DocumentParser
+
+_lock = threading.RLock()
+_models: Dict[Tuple[str, str, Optional[int]], "SentenceTransformer"] = {}
+_stores: Dict[str, "FaissStore"] = {}
+_sourceRegistries: Dict[str, SourceRegistry] = {}
+_batchParsers: Dict[Tuple[Optional[int], Tuple], "BatchParser"] = {}
+_closeRegistered = False
+
+
+def getModel(modelName: str, backend: str = "torch", threads: Optional[int] = None) -> "SentenceTransformer":
+    """The shared CPU instance of `modelName` on `backend`, loaded on first use."""
+    key = (modelName, backend, threads)
+    with _lock:
+        if key not in _models:
+            _models[key] = loadModel(modelName, backend, threads)
+        return _models[key]
+
+
+def getStore(indexPath: str = "vectorDB/index.faiss", lazy: bool = True, **options) -> "FaissStore":
+    """The shared store for `indexPath`, created on first use.
+
+    The store is ``lazy`` by default: its index and model load with the first
+    search or write (or ``warmUp``), not here. `options` are passed to
+    ``FaissStore`` by the call that creates the store and ignored afterwards.
+    """
+    from project.vectorStore.faissStore import FaissStore
+    key = os.path.abspath(indexPath)
+    with _lock:
+        if key not in _stores:
+            _registerClose()
+            _stores[key] = FaissStore(indexPath=indexPath, lazy=lazy, **options)
+        return _stores[key]
+
+
+def getShardedStore(rootDir: str = "vectorDB/shards", **options) -> "ShardedStore":
+    """The shared ``ShardedStore`` for `rootDir`, started on first use (see `getStore`)."""
+    from project.vectorStore.shardedStore import ShardedStore
+    key = os.path.abspath(rootDir)
+    with _lock:
+        if key not in _stores:
+            _registerClose()
+            _stores[key] = ShardedStore(rootDir=rootDir, **options)
+        return _stores[key]
+
+
+def getSourceRegistry(path: str = "vectorDB/sources.json") -> SourceRegistry:
+    """The shared ``SourceRegistry`` of the fingerprint file `path`."""
+    key = os.path.abspath(path)
+    with _lock:
+        if key not in _sourceRegistries:
+            _sourceRegistries[key] = SourceRegistry(path)
+        return _sourceRegistries[key]
+
+
+def getBatchParser(workers: Optional[int] = None, parser: Optional["DocumentParser"] = None) -> "BatchParser":
+    """The shared ``BatchParser`` for `workers` processes chunking like `parser`.
+
+    Its process pool starts with the first batch and is shut down by `closeAll`.
+    """
+    from project.documentParsers.batchParser import BatchParser
+    from project.documentParsers.parsers import DocumentParser
+    parser = parser or DocumentParser()
+    key = (workers, tuple(sorted(parser.options.items())))
+    with _lock:
+        if key not in _batchParsers:
+            _registerClose()
+            _batchParsers[key] = BatchParser(workers, parser=parser)
+        return _batchParsers[key]
+
+
+def warmUp(*resources, background: bool = True) -> Optional[threading.Thread]:
+    """Call ``warmUp`` on each store (or anything with a ``warmUp`` method), on a
+    daemon thread unless `background` is false, so the first request does not
+    wait for the index and model to load."""
+    def run():
+        for resource in resources:
+            try:
+                resource.warmUp()
+            except Exception as exc:  # the first real request will raise it again
+                print(f"resourceRegistry: warm-up of {type(resource).__name__} failed: {exc!r}")
+    if not background:
+        run()
+        return None
+    worker = threading.Thread(target=run, name="WarmUp", daemon=True)
+    worker.start()
+    return worker
+
+
+def closeAll():
+    """Close every shared store (waits for background compaction/promotion)
+    and shut down the parser pools."""
+    with _lock:
+        resources = list(_stores.values()) + list(_batchParsers.values())
+        _stores.clear()
+        _batchParsers.clear()
+    for resource in resources:
+        resource.close()
+
+
+def _registerClose():
+    global _closeRegistered
+    if not _closeRegistered:
+        atexit.register(closeAll)
+        _closeRegistered = True
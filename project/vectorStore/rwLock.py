@@ -0,0 +1,47 @@
+# vector_store/rw_lock.py
+from contextlib import contextmanager
+import threading
+
+
+class RWLock:
+    """Many readers or one writer at a time.
+
+    A waiting writer stops new readers from entering, so a steady stream of
+    searches cannot starve an add. Not reentrant: a thread must not take
+    ``write`` while it holds ``read`` (or either one twice).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waitingWriters = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waitingWriters:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waitingWriters += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waitingWriters -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
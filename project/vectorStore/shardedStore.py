@@ -0,0 +1,290 @@
+# vector_store/sharded_store.py
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import os, json, itertools, threading, traceback, multiprocessing
+import numpy as np
+from project.vectorStore.embedder import Embedder
+from project.vectorStore.embeddingCache import textHash
+from project.vectorStore.faissStore import STREAM_BATCH
+from project.vectorStore.resourceRegistry import getSourceRegistry
+from project.mcp.tracing import span
+
+SHARDS = 4
+PARTITIONS = ("source", "chunk")
+SHARD_REQUESTS = 8  # requests a shard process serves at once
+
+
+def _serveShard(conn, indexPath: str, options: dict):
+    """Body of a shard process: one ``FaissStore``, driven by (callId, method, args, kwargs) requests.
+
+    Requests run on a pool of threads and are answered as they finish, tagged
+    with their callId, so searches share the store's read lock instead of
+    queueing behind each other or behind a long write. The store is lazy, so
+    the shard answers cheap calls (``sources``) at once and opens with the
+    first search, write or ``warmUp``.
+    """
+    from project.vectorStore.faissStore import FaissStore
+    options.setdefault("lazy", True)
+    store = FaissStore(indexPath=indexPath, **options)
+    sendLock = threading.Lock()
+
+    def reply(callId: int, status: str, value: Any):
+        with sendLock:
+            try:
+                conn.send((callId, status, value))
+            except Exception:  # the value (an exception) does not pickle
+                conn.send((callId, "error", RuntimeError(traceback.format_exc())))
+
+    def handle(callId: int, method: str, args: tuple, kwargs: dict):
+        try:
+            target = store
+            for name in method.split("."):
+                target = getattr(target, name)
+            reply(callId, "ok", target(*args, **kwargs) if callable(target) else target)
+        except Exception as exc:
+            reply(callId, "error", exc)
+
+    with ThreadPoolExecutor(SHARD_REQUESTS, thread_name_prefix="FaissShard") as pool:
+        while True:
+            callId, method, args, kwargs = conn.recv()
+            if method is None:  # shutdown, once the requests in flight are answered
+                break
+            pool.submit(handle, callId, method, args, kwargs)
+    store.close()
+    reply(callId, "ok", None)
+
+
+class _Shard:
+    def __init__(self, context, indexPath: str, options: dict):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serveShard, args=(child, indexPath, options),
+                                       name=f"FaissShard-{os.path.basename(os.path.dirname(indexPath))}",
+                                       daemon=True)
+        self.process.start()
+        child.close()
+        self.lock = threading.Lock()  # guards sending on the pipe and `pending`
+        self.ids = itertools.count()
+        self.pending: Dict[int, Future] = {}  # callId -> future of a request in flight
+        self.error: Optional[Exception] = None  # set once the process is gone
+        self.reader = threading.Thread(target=self._read, name=f"{self.process.name}-reader", daemon=True)
+        self.reader.start()
+
+    def call(self, method: Optional[str], *args, **kwargs) -> Future:
+        """Send one request (None: shut down); its future resolves with the shard's reply."""
+        future = Future()
+        with self.lock:
+            if self.error is not None:
+                raise self.error
+            callId = next(self.ids)
+            self.pending[callId] = future
+            self.conn.send((callId, method, args, kwargs))
+        return future
+
+    def _read(self):
+        """Resolve the futures of the replies, in whatever order the shard answers."""
+        while True:
+            try:
+                callId, status, value = self.conn.recv()
+            except (EOFError, ConnectionError, OSError):
+                break
+            with self.lock:
+                future = self.pending.pop(callId)
+            if status == "error":
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+        self.process.join(timeout=1)
+        with self.lock:
+            self.error = RuntimeError(f"{self.process.name} exited (code {self.process.exitcode})")
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(self.error)
+
+
+class ShardedStore:
+    """A ``FaissStore`` split across worker processes, with the same interface.
+
+    Each of the ``shards`` processes owns one ``FaissStore`` in
+    ``<rootDir>/shard-<n>``, so the corpus is bounded by the RAM of all of
+    them together and every search scans the shards in parallel. Chunks are
+    routed by a hash of their source (a document stays on one shard) or of
+    their text (``partition="chunk"``, which also spreads one huge document).
+    Searches embed the query once here, send the vector to every shard and
+    merge the per-shard top-k by score. Ids are made global as
+    ``localId * shards + shard``.
+
+    Passages are embedded inside the shards, so ingestion also runs on
+    several cores. ``storeOptions`` are passed to every shard's ``FaissStore``.
+    """
+
+    def __init__(self, shards: int = SHARDS, rootDir: str = "vectorDB/shards", partition: str = "source",
+                 modelName: str = "intfloat/e5-small-v2", embedBackend: str = "torch",
+                 embedThreads: Optional[int] = None, **storeOptions):
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown partition {partition!r}, expected one of {PARTITIONS}")
+        self.rootDir = rootDir
+        self.sourcesPath = os.path.join(rootDir, "sources.json")
+        layoutPath = os.path.join(rootDir, "shards.json")
+        if os.path.exists(layoutPath):
+            with open(layoutPath, "r", encoding="utf-8") as f:
+                layout = json.load(f)
+            if (layout["shards"], layout["partition"]) != (shards, partition):
+                raise ValueError(f"{rootDir} holds {layout['shards']} shards partitioned by "
+                                 f"{layout['partition']}; open it with the same settings")
+        else:
+            os.makedirs(rootDir, exist_ok=True)
+            with open(layoutPath, "w", encoding="utf-8") as f:
+                json.dump({"shards": shards, "partition": partition}, f)
+        self.count = shards
+        self.partition = partition
+        self.version = 0
+        self.lock = threading.Lock()
+
+        # spawn, not fork: the parent runs threads (bus workers, torch) that fork would copy mid-flight
+        context = multiprocessing.get_context("spawn")
+        shardThreads = embedThreads or max(1, (os.cpu_count() or 1) // shards)
+        self.shards: List[_Shard] = []
+        for n in range(shards):
+            shardDir = os.path.join(rootDir, f"shard-{n}")
+            options = dict(storeOptions, modelName=modelName, embedBackend=embedBackend,
+                           embedThreads=shardThreads, metaPath=os.path.join(shardDir, "meta.json"))
+            options.setdefault("cachePath", os.path.join(shardDir, "embeddings.sqlite"))
+            self.shards.append(_Shard(context, os.path.join(shardDir, "index.faiss"), options))
+        self.embedder = Embedder(modelName, embedBackend, embedThreads)
+        self.prefixesKnown = False  # asked from the shards by the first query, once they are up
+
+    # ---------- public ----------
+    def add(self, chunks: Sequence[str], source: str, tags: Optional[Sequence[str]] = None) -> int:
+        calls = [(n, "add", part, source, tags) for n, part in self._split(source, chunks).items() if part]
+        return self._write(calls)
+
+    def upsert(self, source: str, chunks: Sequence[str], tags: Optional[Sequence[str]] = None) -> int:
+        return self._write([(n, "upsert", source, part, tags) for n, part in self._split(source, chunks).items()])
+
+    def upsert_many(self, docs: Sequence[Tuple[str, Sequence[str]]],
+                    tags: Optional[Dict[str, Sequence[str]]] = None) -> int:
+        perShard: Dict[int, List[Tuple[str, List[str]]]] = {}
+        for source, chunks in docs:
+            for n, part in self._split(source, chunks).items():
+                perShard.setdefault(n, []).append((source, part))
+        return self._write([(n, "upsert_many", shardDocs, tags) for n, shardDocs in perShard.items()])
+
+    def upsert_stream(self, source: str, chunks: Iterable[str], batchSize: int = STREAM_BATCH,
+                      tags: Optional[Sequence[str]] = None) -> int:
+        keep, added, batch = set(), 0, []
+        for c in chunks:
+            batch.append(c)
+            if len(batch) >= batchSize:
+                keep.update(textHash(t) for t in batch)
+                added += self.add(batch, source, tags)
+                batch = []
+        keep.update(textHash(t) for t in batch)
+        added += self.add(batch, source, tags)
+        self.prune(source, keep)
+        return added
+
+    def prune(self, source: str, keep: Set[str]) -> int:
+        return self._write([(n, "prune", source, keep) for n in self._owners(source)])
+
+    def remove_source(self, source: str) -> int:
+        removed = self._write([(n, "remove_source", source) for n in self._owners(source)])
+        getSourceRegistry(self.sourcesPath).forget(source)
+        return removed
+
+    def sources(self) -> List[str]:
+        found = self._gather([(n, "sources") for n in range(self.count)])
+        return list(dict.fromkeys(s for perShard in found for s in perShard))
+
+    def embedQuery(self, query: str) -> np.ndarray:
+        return self.embedQueries([query])
+
+    def embedQueries(self, queries: Sequence[str]) -> np.ndarray:
+        if not self.prefixesKnown:
+            # queries must be prefixed the way the shards' passages were
+            self.embedder.prefixes = self._gather([(n, "usesPrefixes") for n in range(self.count)])[0]
+            self.prefixesKnown = True
+        return self.embedder.embedQueries(queries)
+
+    def search(self, query: str, k: int = 5, queryVector: Optional[np.ndarray] = None,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        vecs = None if queryVector is None else queryVector.reshape(1, -1)
+        return self.search_batch([query], k, queryVectors=vecs, filters=filters)[0]
+
+    def search_batch(self, queries: Sequence[str], k: int = 5, queryVectors: Optional[np.ndarray] = None,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Every shard's top-k for every query, merged into the global top-k by score."""
+        if not len(queries):
+            return []
+        vecs = self.embedQueries(queries) if queryVectors is None else queryVectors
+        with span("search"):
+            found = self._gather([(n, "search_batch", list(queries), k, vecs, filters) for n in range(self.count)])
+        merged = []
+        for q in range(len(queries)):
+            rows = [dict(r, id=r["id"] * self.count + n) for n, perShard in enumerate(found) for r in perShard[q]]
+            merged.append(sorted(rows, key=lambda r: -r["score"])[:k])
+        return merged
+
+    def vectors(self, ids: Sequence[int]) -> np.ndarray:
+        perShard: Dict[int, List[int]] = {}
+        for pos, i in enumerate(ids):
+            perShard.setdefault(i % self.count, []).append(pos)
+        order = list(perShard)
+        found = self._gather([(n, "vectors", [ids[p] // self.count for p in perShard[n]]) for n in order])
+        out = np.zeros((len(ids), self.embedder.model.get_sentence_embedding_dimension()), dtype="float32")
+        for n, vecs in zip(order, found):
+            out[perShard[n]] = vecs
+        return out
+
+    def tune(self, nprobe: Optional[int] = None, efSearch: Optional[int] = None):
+        self._gather([(n, "tune", nprobe, efSearch) for n in range(self.count)])
+
+    def promote(self, wait: bool = True):
+        self._gather([(n, "promote", wait) for n in range(self.count)])
+
+    def compact(self, wait: bool = True):
+        self._gather([(n, "compact", wait) for n in range(self.count)])
+
+    def warmUp(self):
+        """Wait for every shard to open and load the query model here."""
+        self._gather([(n, "warmUp") for n in range(self.count)])
+        self.embedQueries(["warm-up"])
+
+    def close(self):
+        """Close every shard's store and stop its process."""
+        for shard in self.shards:
+            if shard.process.is_alive():
+                shard.call(None).result()
+            shard.process.join()
+
+    # ---------- private ----------
+    def _shardOf(self, key: str) -> int:
+        return int(textHash(key)[:8], 16) % self.count
+
+    def _owners(self, source: str) -> List[int]:
+        """Shards that may hold chunks of `source`."""
+        return [self._shardOf(source)] if self.partition == "source" else list(range(self.count))
+
+    def _split(self, source: str, chunks: Sequence[str]) -> Dict[int, List[str]]:
+        """Chunks per owning shard; every owner is listed, with an empty part if none go there."""
+        parts = {n: [] for n in self._owners(source)}
+        for c in chunks:
+            parts[self._shardOf(source if self.partition == "source" else c)].append(c)
+        return parts
+
+    def _write(self, calls: List[tuple]) -> int:
+        total = sum(self._gather(calls))
+        if total > 0:  # a write that changed nothing leaves cached answers valid
+            with self.lock:
+                self.version += 1
+        return total
+
+    def _gather(self, calls: List[tuple]) -> List[Any]:
+        """Send every (shard, method, *args) call, then collect the results in order.
+
+        The calls run concurrently across the shard processes, and alongside
+        the calls of other threads; the first error is raised once every call
+        has finished.
+        """
+        futures = [self.shards[n].call(method, *args) for n, method, *args in calls]
+        wait(futures)
+        return [f.result() for f in futures]
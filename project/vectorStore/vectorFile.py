@@ -0,0 +1,71 @@
+# vector_store/vector_file.py
+from typing import Optional, Sequence
+import os, threading
+import numpy as np
+
+
+class VectorFile:
+    """Exact float32 copy of every stored vector, kept next to a compressed index.
+
+    Row ``id`` lives at byte offset ``id * dim * 4`` of one flat file, so ids
+    index it directly and rows never move. Reads go through a read-only memory
+    map: only the pages of the rows asked for are loaded, and the OS can drop
+    them again under memory pressure. Rows of ids that were never written read
+    back as zeros.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.rowBytes = dim * 4
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.existed = os.path.exists(path)
+        self.file = open(path, "r+b" if self.existed else "w+b")
+        self._map: Optional[np.memmap] = None
+
+    # ---------- public ----------
+    def write(self, ids: Sequence[int], vecs: np.ndarray):
+        if not len(ids):
+            return
+        ids = np.asarray(ids, dtype="int64")
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        # one write per run of consecutive ids (a batch of new chunks is a single run)
+        breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+        with self.lock:
+            for start, stop in zip(np.r_[0, breaks], np.r_[breaks, len(ids)]):
+                self.file.seek(int(ids[start]) * self.rowBytes)
+                self.file.write(vecs[start:stop].tobytes())
+            self.file.flush()
+
+    def read(self, ids: Sequence[int]) -> np.ndarray:
+        ids = np.asarray(ids, dtype="int64")
+        out = np.zeros((len(ids), self.dim), dtype="float32")
+        with self.lock:
+            rows = self._rows(int(ids.max()) + 1 if len(ids) else 0)
+            if rows:
+                inside = ids < rows
+                out[inside] = self._map[ids[inside]]
+        return out
+
+    def flush(self):
+        """Make every written row durable."""
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        with self.lock:
+            self._map = None
+            self.file.close()
+
+    # ---------- private ----------
+    def _rows(self, wanted: int) -> int:
+        """Rows covered by the map, remapping first if the file grew past it."""
+        mapped = 0 if self._map is None else len(self._map)
+        if wanted > mapped:
+            rows = os.path.getsize(self.path) // self.rowBytes
+            if rows > mapped:
+                self._map = np.memmap(self.path, dtype="float32", mode="r", shape=(rows, self.dim))
+                mapped = rows
+        return mapped
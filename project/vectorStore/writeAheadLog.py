@@ -0,0 +1,75 @@
+# vector_store/write_ahead_log.py
+from typing import Any, Dict, Iterator, Optional, Tuple
+import os, json, struct, zlib
+import numpy as np
+
+# every record is framed as <body length, crc32 of body> followed by the body;
+# the body is <json header length><json header><raw float32 vectors>
+FRAME = struct.Struct("<II")
+HEAD = struct.Struct("<I")
+
+
+class WriteAheadLog:
+    """Append-only segment file holding the adds made since the last snapshot."""
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+
+    # ---------- public ----------
+    def append(self, record: Dict[str, Any], vecs: Optional[np.ndarray] = None):
+        header = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        payload = b"" if vecs is None else np.ascontiguousarray(vecs, dtype="float32").tobytes()
+        body = HEAD.pack(len(header)) + header + payload
+        f = self._open()
+        f.write(FRAME.pack(len(body), zlib.crc32(body)) + body)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def size(self) -> int:
+        if self._file is not None:
+            return self._file.tell()
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def replay(path: str, dim: int) -> Iterator[Tuple[Dict[str, Any], np.ndarray]]:
+        """Yield (record, vectors) for every intact record and cut off a torn tail.
+
+        A crash in the middle of `append` leaves a partial or corrupt frame at the
+        end of the segment; everything before it is still valid, so the file is
+        truncated back to the last good record before new appends go after it.
+        """
+        if not os.path.exists(path):
+            return
+        good = 0
+        with open(path, "rb") as f:
+            while True:
+                frame = f.read(FRAME.size)
+                if len(frame) < FRAME.size:
+                    break
+                length, crc = FRAME.unpack(frame)
+                body = f.read(length)
+                if len(body) < length or zlib.crc32(body) != crc:
+                    break
+                (headLen,) = HEAD.unpack_from(body)
+                record = json.loads(body[HEAD.size:HEAD.size + headLen].decode("utf-8"))
+                vecs = np.frombuffer(body[HEAD.size + headLen:], dtype="float32").reshape(-1, dim)
+                good = f.tell()
+                yield record, vecs
+        if good < os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good)
+
+    # ---------- private ----------
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "ab")
+        return self._file